@@ -0,0 +1,727 @@
+"""
+Items sheet loading for the manager dashboard (managers.py).
+"""
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from gspread.utils import rowcol_to_a1
+
+# Declared schema of the Items sheet: column -> (type, date formats).
+# Date formats are tried in order; the first is what variance.py writes and
+# later ones only see the cells the earlier ones could not parse. Columns not
+# listed stay text; numeric blanks become 0. Money stays float64: float32 keeps
+# only about 7 significant digits, too few for amounts to the cent.
+ITEMS_SCHEMA = {
+    'Date Submitted': ('datetime', ['%Y-%m-%d %H:%M:%S']),
+    'Expiry': ('datetime', ['%d-%b-%y', '%Y-%m-%d']),
+    'Qty': ('int32', None),
+    'Cost': ('float64', None),
+    'Selling': ('float64', None),
+    'Amount': ('float64', None),
+    'GP%': ('float64', None),
+    'CF': ('float32', None),
+}
+# Low-cardinality text columns held as pandas categoricals
+CATEGORY_COLUMNS = ['Outlet', 'Form Type', 'Action Took', 'Unit', 'Supplier']
+# Day-resolution copies of the date columns, used by the date filters
+DAY_COLUMNS = {'Date Submitted': 'SUBMITTED_DAY', 'Expiry': 'EXPIRY_DAY'}
+# Columns that never change after a submission; their raw text identifies a row
+IDENTITY_COLUMNS = ['Date Submitted', 'Form Type', 'Barcode', 'Item Name', 'Qty', 'Expiry', 'Outlet', 'Staff Name']
+FIRST_DATA_ROW = 2  # Row 1 holds the headers
+
+
+def column_letter(col):
+    """1-based column number -> A1 column letters (1 -> 'A', 28 -> 'AB')."""
+    return re.sub(r"\d+", "", rowcol_to_a1(1, col))
+
+
+def row_keys(raw):
+    """
+    Stable row identifier: a uint64 fingerprint of the raw (string)
+    IDENTITY_COLUMNS of each row. Unlike the sheet row number it does not
+    change when rows are inserted or deleted above.
+    """
+    keys = None
+    for col in IDENTITY_COLUMNS:
+        if col in raw:  # DataFrame columns or dict keys
+            hashed = pd.util.hash_array(np.asarray(raw[col], dtype=object), categorize=False)
+            keys = hashed if keys is None else keys * np.uint64(1000003) ^ hashed
+    return keys if keys is not None else np.zeros(len(raw), dtype='uint64')
+
+
+def _parse_number(raw, kind):
+    """(typed column, failed cells) for one numeric column; blanks are 0, not failures."""
+    cells = pa.array(raw, type=pa.string())
+    blank = pc.equal(pc.utf8_trim_whitespace(cells), '')
+    try:
+        # Fast path: Arrow casts the whole column at once when every cell is a number
+        values = pc.cast(pc.if_else(blank, None, cells), pa.float64()).to_numpy(zero_copy_only=False)
+        failed = 0
+    except pa.ArrowInvalid:
+        values = pd.to_numeric(pd.Series(raw, dtype=object), errors='coerce').to_numpy(dtype='float64')
+        failed = int((np.isnan(values) & ~blank.to_numpy(zero_copy_only=False)).sum())
+    values = np.nan_to_num(values, nan=0.0)
+    if kind == 'int32':
+        # Fractional quantities keep their decimals rather than being truncated
+        if np.all(values % 1 == 0) and np.all(np.abs(values) < 2**31):
+            return values.astype('int32'), failed
+        return values, failed
+    return values.astype(kind), failed
+
+
+def _parse_date(raw, formats):
+    """(datetime column, failed cells); each format only sees what earlier ones missed."""
+    todo = pc.not_equal(pc.utf8_trim_whitespace(pa.array(raw, type=pa.string())), '').to_numpy(zero_copy_only=False)
+    raw = pd.Series(raw, dtype=object)
+    values = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+    for fmt in formats:
+        if not todo.any():
+            break
+        values[todo] = pd.to_datetime(raw[todo], format=fmt, errors='coerce')
+        todo &= values.isna().to_numpy()
+    return values.to_numpy(), int(todo.sum())
+
+
+def pad_rows(records, width):
+    """`records` cut or padded with '' to `width` cells (the Sheets API trims trailing blank cells)."""
+    return [r if len(r) == width else list(r[:width]) + [''] * (width - len(r)) for r in records]
+
+
+def parse_action_records(records, headers, first_row=FIRST_DATA_ROW):
+    """
+    Builds the typed dashboard frame from raw sheet rows in one pass over
+    the columns, typed by ITEMS_SCHEMA (explicit date formats, sized
+    numbers); other columns stay text.
+    `first_row` is the sheet row number of records[0], used for GSHEET_ROW_INDEX.
+    Non-blank cells that fail to parse are counted per column in
+    df.attrs['parse_failures'].
+    """
+    width = len(headers)
+    records = pad_rows(records, width)
+    cells = np.array(records, dtype=object).reshape(len(records), width)
+    raw = {col: cells[:, i] for i, col in enumerate(headers)}
+
+    columns = {}
+    failures = {}
+    for col in headers:
+        kind, formats = ITEMS_SCHEMA.get(col, ('text', None))
+        if kind == 'datetime':
+            columns[col], failed = _parse_date(raw[col], formats)
+        elif kind in ('int32', 'float32', 'float64'):
+            columns[col], failed = _parse_number(raw[col], kind)
+        else:
+            columns[col], failed = raw[col], 0
+        if failed:
+            failures[col] = failed
+    df = pd.DataFrame(columns, index=pd.RangeIndex(len(records)))
+
+    # Add a temporary 'GSHEET_ROW_INDEX' column (1-based index)
+    df['GSHEET_ROW_INDEX'] = np.arange(first_row, first_row + len(df), dtype='int64')
+    # Fingerprint the raw cells, so read-backs can be compared as-is
+    df['ROW_KEY'] = row_keys(raw)
+
+    # Ensure 'Action Took' column exists for filtering, defaulting to a blank string
+    if 'Action Took' not in df.columns:
+        df['Action Took'] = ''
+
+    for col, day_col in DAY_COLUMNS.items():
+        if col in df.columns:
+            df[day_col] = df[col].dt.normalize()
+
+    df = categorize_columns(df)
+    df.attrs['parse_failures'] = failures
+    return df
+
+
+def merge_parse_failures(*reports):
+    """Sums per-column parse failure counts."""
+    total = {}
+    for report in reports:
+        for col, n in report.items():
+            total[col] = total.get(col, 0) + n
+    return total
+
+
+def categorize_columns(df):
+    """Converts CATEGORY_COLUMNS to categoricals in place (already-categorical ones are kept)."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def facet_options(df):
+    """
+    Selectbox options per categorical column, read from the categories
+    instead of a unique() scan. Compute once per load (and after edits).
+    """
+    return {
+        col: [c for c in df[col].cat.categories.tolist() if pd.notna(c)]
+        for col in CATEGORY_COLUMNS
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+
+
+def _as_text(series):
+    """Plain-string values for comparisons, with missing cells as ''."""
+    return series.astype(object).where(series.notna(), '').astype(str)
+
+
+def _equals(series, value):
+    """`series == value` as an integer code comparison for categoricals."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if value not in categories:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == categories.get_loc(value)
+    return (series == value).to_numpy()
+
+
+# --- Dashboard filters ---
+def _to_day(value):
+    """date / Timestamp -> integer day number (days since 1970-01-01)."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype('int64'))
+
+
+class DateIndex:
+    """
+    Sort order of the day columns of one loaded frame, so date-range and
+    expiry filters are two binary searches instead of a full scan.
+    Positions refer to rows of the frame it was built from; rebuild it
+    whenever the data is reloaded (only 'Action Took' is edited in place).
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self._sorted = {}
+        for col, day_col in DAY_COLUMNS.items():
+            if day_col not in df.columns:
+                continue
+            days = df[day_col].to_numpy(dtype='datetime64[D]').astype('int64')
+            order = np.argsort(days, kind='stable')
+            sorted_days = days[order]
+            # NaT is the smallest int64, so missing dates sort first; drop them
+            valid_from = np.searchsorted(sorted_days, np.iinfo(np.int64).min, side='right')
+            self._sorted[col] = (sorted_days[valid_from:], order[valid_from:])
+
+    def bounds(self, col):
+        """(min, max) calendar dates present in `col`, or None if it has no dates."""
+        if col not in self._sorted or len(self._sorted[col][0]) == 0:
+            return None
+        sorted_days = self._sorted[col][0]
+        to_date = lambda d: pd.Timestamp(int(d), unit='D').date()
+        return to_date(sorted_days[0]), to_date(sorted_days[-1])
+
+    def mask(self, col, start=None, end=None):
+        """Boolean mask of rows whose day in `col` is within [start, end] (either may be open)."""
+        if col not in self._sorted:
+            return np.ones(self.size, dtype=bool)  # Column not in the sheet: filter does not apply
+        sorted_days, order = self._sorted[col]
+        lo = 0 if start is None else np.searchsorted(sorted_days, _to_day(start), side='left')
+        hi = len(sorted_days) if end is None else np.searchsorted(sorted_days, _to_day(end), side='right')
+        selected = np.zeros(self.size, dtype=bool)
+        selected[order[lo:hi]] = True
+        return selected
+
+
+def build_filter_mask(df, date_range=None, expiry_days=None, form_type=None,
+                      action_status=None, today=None, date_index=None, overlay=None, drill=None):
+    """
+    Combines every dashboard filter into a single boolean mask over `df`,
+    so no intermediate frames are allocated. Filters left as None are skipped.
+    - date_range: (start, end) dates on 'Date Submitted', inclusive
+    - expiry_days: 0 for already expired, N for expiring within N days
+    - date_index: DateIndex of `df`, built on the fly if not given
+    - overlay: resolved session edits (see resolve_overlay) that take
+      precedence over the 'Action Took' values in `df`
+    - drill: (dimension, value) of a LossRollup summary row to drill into
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if date_index is None:
+        date_index = DateIndex(df)
+
+    if date_range is not None:
+        mask &= date_index.mask('Date Submitted', date_range[0], date_range[1])
+
+    if expiry_days is not None:
+        today = pd.Timestamp(today if today is not None else pd.Timestamp.now().normalize())
+        if expiry_days == 0: # Already Expired
+            mask &= date_index.mask('Expiry', end=today - pd.Timedelta(days=1))
+        else:
+            # Items expiring between today and today + N days (inclusive)
+            mask &= date_index.mask('Expiry', today, today + pd.Timedelta(days=expiry_days))
+
+    if form_type is not None:
+        mask &= _equals(df['Form Type'], form_type)
+
+    if action_status is not None:
+        matches = _equals(df['Action Took'], action_status)
+        if overlay is not None and len(overlay):
+            matches[overlay.index.to_numpy()] = overlay.to_numpy() == action_status
+        mask &= matches
+
+    if drill is not None:
+        mask &= _drill_mask(df, drill[0], drill[1], date_index)
+
+    return mask
+
+
+# --- Editor paging: search, sort and slice the filtered rows ---
+SEARCH_COLUMNS = ['Item Name', 'Barcode', 'Supplier', 'Staff Name', 'Outlet', 'Remarks']
+PAGE_SIZES = [50, 100, 250, 500]
+
+
+def _contains(series, text):
+    """Case-insensitive substring test; categoricals test each category once."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        hits = _as_text(pd.Series(series.cat.categories)).str.contains(text, case=False, regex=False).to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, hits[codes] if len(hits) else False, False)
+    return _as_text(series).str.contains(text, case=False, regex=False).to_numpy()
+
+
+def matching_positions(df, mask, search=None):
+    """
+    Row positions of `df` that pass `mask` and, when `search` is given,
+    contain it in any SEARCH_COLUMNS. Only the masked rows are searched.
+    """
+    positions = np.flatnonzero(mask)
+    search = (search or '').strip()
+    if not search or len(positions) == 0:
+        return positions
+    hit = np.zeros(len(positions), dtype=bool)
+    for col in SEARCH_COLUMNS:
+        if col in df.columns:
+            hit |= _contains(df[col].iloc[positions], search)
+    return positions[hit]
+
+
+def _overlay_on(positions, overlay):
+    """(offsets into `positions`, overlay values) for the overlay rows among `positions`."""
+    if overlay is None or not len(overlay):
+        return np.array([], dtype=int), np.array([], dtype=object)
+    offsets = pd.Index(positions).get_indexer(overlay.index)
+    found = offsets >= 0
+    return offsets[found], overlay.to_numpy()[found]
+
+
+def page_frame(df, positions, columns, sort_by=None, descending=False, page=1, page_size=100,
+               overlay=None):
+    """
+    One editor page: the rows at `positions` (optionally sorted by `sort_by`,
+    blanks last), sliced to page `page` (1-based). Only the page's rows and
+    `columns` are copied, so the cost per rerun does not grow with the sheet.
+    'Action Took' comes back as plain strings with `overlay` applied.
+    """
+    if sort_by is not None and len(positions):
+        keys = df[sort_by].iloc[positions].reset_index(drop=True)
+        # Text may load as object or as pandas' str dtype, depending on the pandas version
+        if isinstance(keys.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(keys):
+            keys = _as_text(keys)
+            if sort_by == 'Action Took':
+                offsets, values = _overlay_on(positions, overlay)
+                keys.iloc[offsets] = values
+            keys = keys.where(keys != '')  # Alphabetical, blanks last
+        order = keys.sort_values(ascending=not descending, kind='stable', na_position='last').index
+        positions = positions[order.to_numpy()]
+    start = (max(page, 1) - 1) * page_size
+    page_positions = positions[start:start + page_size]
+    column_positions = df.columns.get_indexer(columns)
+    if (column_positions < 0).any():
+        # get_indexer marks a missing column with -1, which iloc would read as the last column
+        raise KeyError(f"Columns not in the Items data: {[c for c, i in zip(columns, column_positions) if i < 0]}")
+    page = df.iloc[page_positions, column_positions]
+    if 'Action Took' in page.columns:
+        # The editor writes free values into 'Action Took', so hand it plain strings
+        actions = page['Action Took'].astype(object)
+        offsets, values = _overlay_on(page_positions, overlay)
+        actions.iloc[offsets] = values
+        page['Action Took'] = actions
+    return page
+
+
+# --- Save path: change detection and range coalescing ---
+def pending_action_edits(view, edited_rows):
+    """
+    Reads the st.data_editor delta (`edited_rows`: {view position: {column: value}})
+    and returns the 'Action Took' values that differ from `view`, keyed by
+    GSHEET_ROW_INDEX. Cost grows with the number of edits, not the table size.
+    """
+    edits = {int(pos): cells['Action Took'] for pos, cells in edited_rows.items() if 'Action Took' in cells}
+    if not edits:
+        return pd.Series([], dtype=object)
+
+    positions = list(edits)
+    current = _as_text(view['Action Took'].iloc[positions]).to_numpy()
+    changes = pd.Series(
+        ['' if v is None else str(v) for v in edits.values()],
+        index=view['GSHEET_ROW_INDEX'].iloc[positions].to_numpy(),
+        dtype=object,
+    )
+    return changes[changes.to_numpy() != current]
+
+
+# --- Per-session overlay of unsaved 'Action Took' edits ---
+def resolve_overlay(snapshot, overlay):
+    """
+    The overlay ({sheet row: value}) as a Series of values indexed by row
+    position in `snapshot.df`; rows the snapshot does not hold are dropped.
+    """
+    if not overlay:
+        return pd.Series([], dtype=object)
+    positions = snapshot.row_index.get_indexer(list(overlay))
+    found = positions >= 0
+    return pd.Series(np.array(list(overlay.values()), dtype=object)[found], index=positions[found])
+
+
+def stage_action_edits(snapshot, overlay, changes):
+    """
+    Records editor `changes` (new values keyed by GSHEET_ROW_INDEX) in the
+    session `overlay` ({sheet row: value}). Edits that restore the snapshot's
+    value are dropped, so len(overlay) is the number of unsaved cells.
+    """
+    if changes.empty:
+        return overlay
+    positions = snapshot.row_index.get_indexer(changes.index)
+    originals = _as_text(snapshot.df['Action Took'].iloc[np.maximum(positions, 0)]).to_numpy()
+    for row, value, pos, original in zip(changes.index, changes.to_numpy(), positions, originals):
+        if pos >= 0 and original == value:
+            overlay.pop(int(row), None)
+        else:
+            overlay[int(row)] = value
+    return overlay
+
+
+def overlay_changes(snapshot, overlay):
+    """
+    The overlay entries that still differ from `snapshot`, as a Series of
+    new values indexed by sheet row number (sorted), ready for
+    coalesce_cell_updates.
+    """
+    if not overlay:
+        return pd.Series([], dtype=object)
+    changes = pd.Series(list(overlay.values()), index=list(overlay), dtype=object).sort_index()
+    positions = snapshot.row_index.get_indexer(changes.index)
+    found = positions >= 0
+    changes = changes[found]
+    current = _as_text(snapshot.df['Action Took'].iloc[positions[found]]).to_numpy()
+    return changes[changes.to_numpy() != current]
+
+
+def _row_runs(rows):
+    """(start, end) slices of sorted `rows` covering runs of consecutive row numbers."""
+    # A new run starts wherever the row number jumps by more than one
+    breaks = [0, *(np.flatnonzero(np.diff(rows) != 1) + 1), len(rows)]
+    return list(zip(breaks[:-1], breaks[1:]))
+
+
+def coalesce_cell_updates(changes, col_index):
+    """
+    Turns {sheet row -> value} changes in one column into batch_update
+    entries, merging runs of consecutive rows into a single A1 range.
+    """
+    if changes.empty:
+        return []
+
+    rows = changes.index.to_numpy()
+    values = changes.to_numpy()
+    col = column_letter(col_index)
+
+    updates = []
+    for start, end in _row_runs(rows):
+        first_row, last_row = int(rows[start]), int(rows[end - 1])
+        cell_range = f"{col}{first_row}" if first_row == last_row else f"{col}{first_row}:{col}{last_row}"
+        updates.append({
+            'range': cell_range,
+            'values': [[v] for v in values[start:end]],
+        })
+    return updates
+
+
+def check_action_conflicts(worksheet, snapshot, changes):
+    """
+    Optimistic concurrency check for a save. Reads back only the target rows
+    of `changes` (new 'Action Took' values keyed by sheet row, sorted) in one
+    batch_get, and compares them with the snapshot the edits were made on:
+    - the row's ROW_KEY must match (otherwise rows were inserted or deleted
+      and the row number now points at another submission),
+    - its 'Action Took' must still hold the snapshot value (otherwise
+      another manager saved it in the meantime).
+    Returns (safe changes to write, conflicts DataFrame). Cells that already
+    hold the new value are in neither.
+    """
+    conflict_columns = ['Row', 'Item Name', 'Reason', 'Loaded value', 'Sheet value', 'Your value']
+    if changes.empty:
+        return changes, pd.DataFrame(columns=conflict_columns)
+
+    headers = snapshot.headers
+    last_col = column_letter(len(headers))
+    rows = changes.index.to_numpy()
+    runs = _row_runs(rows)
+    results = worksheet.batch_get([f"A{rows[start]}:{last_col}{rows[end - 1]}" for start, end in runs])
+
+    read_back = []
+    for (start, end), values in zip(runs, results):
+        # The API trims trailing blank rows and cells
+        values = list(values) + [[]] * (end - start - len(values))
+        read_back.extend(list(r[:len(headers)]) + [''] * (len(headers) - len(r)) for r in values)
+    read_back = pd.DataFrame(read_back, columns=headers)
+
+    positions = snapshot.row_index.get_indexer(rows)
+    loaded = snapshot.df.iloc[positions]
+    sheet_values = read_back['Action Took'].to_numpy()
+    loaded_values = _as_text(loaded['Action Took']).to_numpy()
+    new_values = changes.to_numpy()
+
+    moved = row_keys(read_back) != loaded['ROW_KEY'].to_numpy()
+    done = ~moved & (sheet_values == new_values)
+    changed_elsewhere = ~moved & ~done & (sheet_values != loaded_values)
+    safe = ~moved & ~done & ~changed_elsewhere
+
+    conflicted = moved | changed_elsewhere
+    conflicts = pd.DataFrame({
+        'Row': rows[conflicted],
+        'Item Name': _as_text(loaded['Item Name']).to_numpy()[conflicted] if 'Item Name' in loaded else '',
+        'Reason': np.where(moved[conflicted], 'Row moved (rows inserted or deleted)', 'Changed by someone else'),
+        'Loaded value': loaded_values[conflicted],
+        'Sheet value': sheet_values[conflicted],
+        'Your value': new_values[conflicted],
+    }, columns=conflict_columns)
+    return changes[safe], conflicts
+
+
+# --- Loss rollups: value lost per outlet, form type, supplier and week ---
+ROLLUP_DIMENSIONS = ['Outlet', 'Form Type', 'Supplier', 'Week']
+ROLLUP_MEASURES = ['Amount', 'Qty', 'Cost']
+
+
+def week_start(days):
+    """Monday of the week of each date (NaT stays NaT)."""
+    days = pd.Series(days).dt.normalize()
+    return days - pd.to_timedelta(days.dt.dayofweek, unit='D')
+
+
+def _rollup_groups(df):
+    """Per-group sums of ROLLUP_MEASURES and row counts for the rows of `df`."""
+    blank = pd.Series('', index=df.index)
+    frame = pd.DataFrame({dim: _as_text(df[dim]) if dim in df.columns else blank
+                          for dim in ROLLUP_DIMENSIONS[:-1]})
+    frame['Week'] = week_start(df['Date Submitted']) if 'Date Submitted' in df.columns else pd.NaT
+    for col in ROLLUP_MEASURES:
+        # Summed in 64 bits, so Qty totals cannot overflow int32
+        dtype = 'int64' if col == 'Qty' else 'float64'
+        frame[col] = df[col].to_numpy(dtype=dtype) if col in df.columns else np.zeros(len(df), dtype=dtype)
+    frame['Rows'] = np.ones(len(df), dtype='int64')
+    return frame.groupby(ROLLUP_DIMENSIONS, dropna=False, sort=False).sum()
+
+
+class LossRollup:
+    """
+    Pre-aggregated totals of ROLLUP_MEASURES per (outlet, form type,
+    supplier, week), built once from the full frame. Appended rows are
+    folded in by `extend`, which groups only the new rows and merges them
+    into the existing groups, so a refresh costs O(new rows + groups)
+    rather than a groupby over the whole history. Like ItemsSnapshot it is
+    never modified: `extend` returns a new rollup.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._summaries = {}  # (by, start, end) -> summary; safe to keep as the table never changes
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(_rollup_groups(df))
+
+    def extend(self, new_rows):
+        if new_rows.empty:
+            return self
+        added = _rollup_groups(new_rows)
+        # New rows land in the latest week or two: only those weeks' groups are regrouped
+        weeks = self.table.index.get_level_values('Week')
+        touched = weeks.isin(added.index.get_level_values('Week').unique())
+        merged = pd.concat([self.table[touched], added]).groupby(level=ROLLUP_DIMENSIONS, dropna=False, sort=False).sum()
+        return LossRollup(pd.concat([self.table[~touched], merged]))
+
+    def summary(self, by, start=None, end=None):
+        """
+        Totals per value of the dimension `by`, largest Amount first (weeks
+        in date order). `start`/`end` keep the weeks that overlap that
+        date range, so the totals are exact only to the week.
+        """
+        if (by, start, end) in self._summaries:
+            return self._summaries[(by, start, end)]
+        table = self.table
+        if start is not None or end is not None:
+            weeks = table.index.get_level_values('Week')
+            keep = weeks.notna()
+            if start is not None:
+                keep &= weeks >= week_start(pd.Series([pd.Timestamp(start)]))[0]
+            if end is not None:
+                keep &= weeks <= pd.Timestamp(end)
+            table = table[keep]
+        totals = table.groupby(level=by, dropna=False, sort=False).sum()
+        if by == 'Week':
+            totals = totals.sort_index()
+        else:
+            totals = totals.sort_values('Amount', ascending=False)
+        self._summaries[(by, start, end)] = totals.reset_index()
+        return self._summaries[(by, start, end)]
+
+
+def _drill_mask(df, by, value, date_index):
+    """Rows of `df` that fall in the rollup group `by` == `value` (see LossRollup.summary)."""
+    if by == 'Week':
+        if pd.isna(value):
+            return df['Date Submitted'].isna().to_numpy() if 'Date Submitted' in df.columns else np.zeros(len(df), bool)
+        return date_index.mask('Date Submitted', value, pd.Timestamp(value) + pd.Timedelta(days=6))
+    if by not in df.columns:
+        # The rollup files every row under '' for a column the sheet lacks
+        return np.full(len(df), value == '')
+    matches = _equals(df[by], value)
+    if value == '':
+        matches |= df[by].isna().to_numpy()
+    return matches
+
+
+class ItemsSnapshot:
+    """
+    One immutable, versioned copy of the Items sheet, shared by every
+    session in the process. It is never modified after it is built: a
+    refresh produces a new snapshot (a change to 'Action Took' alone
+    replaces just that column; appended rows rebuild every column), and
+    sessions keep their unsaved edits in a small overlay (see
+    stage_action_edits). A session with no unsaved edits moves to the newest
+    snapshot on its next rerun (see managers.py), so older snapshots are
+    only kept alive by sessions that are editing them. The date index and
+    facets are built once here instead of once per session.
+    """
+
+    def __init__(self, df, headers, version, parse_failures=None, rollup=None):
+        self.df = df
+        self.headers = headers
+        self.version = version
+        self.parse_failures = parse_failures or {} # Column -> cells that failed to parse
+        self.row_index = pd.Index(df['GSHEET_ROW_INDEX'] if 'GSHEET_ROW_INDEX' in df.columns else [])
+        self.date_index = DateIndex(df)
+        self.facets = facet_options(df)
+        # Passed in by ItemsSheetSync when it could be extended from the previous snapshot's
+        self.rollup = rollup if rollup is not None else LossRollup.from_frame(df)
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.DataFrame(), [], 0)
+
+
+class ItemsSheetSync:
+    """
+    Process-wide incremental mirror of the Items sheet.
+
+    The sheet normally only grows by appended rows, and the only in-place
+    edits are to 'Action Took'. So after the first full download, `refresh`
+    makes a single batch_get for:
+    - the header row (any layout change triggers a full reload),
+    - the rows after the last one seen,
+    - the 'Action Took' column of the rows already held,
+    - the last row held, whose ROW_KEY must still match (otherwise rows were
+      inserted or deleted, the held row numbers are wrong, and the sheet is
+      downloaded again).
+    Each refresh that finds a change publishes a new ItemsSnapshot with the
+    next version number; the previous snapshot is left untouched for the
+    sessions still holding it. Appended rows are folded into the previous
+    snapshot's LossRollup instead of re-aggregating the whole sheet.
+    """
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.snapshot = ItemsSnapshot.empty()
+        self._stale = False
+        self._lock = threading.Lock()
+
+    @property
+    def headers(self):
+        return self.snapshot.headers
+
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def last_row(self):
+        """Sheet row number of the last data row held (1 when only headers)."""
+        return FIRST_DATA_ROW - 1 + len(self.df)
+
+    def invalidate(self):
+        """Forces a full download on the next refresh (rows were inserted or deleted)."""
+        self._stale = True
+
+    def _publish(self, df, headers, parse_failures, rollup=None):
+        self.snapshot = ItemsSnapshot(df, headers, self.snapshot.version + 1, parse_failures, rollup)
+
+    def _holds_last_row(self, values):
+        """True if `values` (the sheet's cells at the last held row number) are still that row."""
+        row = pad_rows(values[:1] or [[]], len(self.headers))
+        key = row_keys(pd.DataFrame(row, columns=self.headers))[0]
+        return key == self.df['ROW_KEY'].iloc[-1]
+
+    def full_reload(self):
+        data = self.worksheet.get_all_values()
+        headers = data[0] if data else []
+        self._stale = False
+        df = parse_action_records(data[1:], headers) if data else pd.DataFrame()
+        self._publish(df, headers, df.attrs.get('parse_failures'))
+
+    def refresh(self):
+        """Brings the mirror up to date and returns the current ItemsSnapshot."""
+        with self._lock:
+            if not self.headers or self._stale:
+                self.full_reload()
+                return self.snapshot
+
+            last_col = column_letter(len(self.headers))
+            ranges = ["1:1", f"A{self.last_row + 1}:{last_col}"]
+            has_action = 'Action Took' in self.headers and len(self.df) > 0
+            if has_action:
+                action_col = column_letter(self.headers.index('Action Took') + 1)
+                ranges.append(f"{action_col}{FIRST_DATA_ROW}:{action_col}{self.last_row}")
+            if len(self.df):
+                ranges.append(f"A{self.last_row}:{last_col}{self.last_row}")
+
+            results = self.worksheet.batch_get(ranges)
+
+            header_row = list(results[0][0]) if results[0] else []
+            if header_row != self.headers or (len(self.df) and not self._holds_last_row(results[-1])):
+                self.full_reload()
+                return self.snapshot
+
+            df = self.df
+            parse_failures = self.snapshot.parse_failures
+            # 'Action Took' edits leave the totals alone; appended rows are folded in
+            rollup = self.snapshot.rollup
+            changed = False
+            if has_action:
+                # The last row is still in place, so a short column only means
+                # the API trimmed blank cells at its end
+                actions = [r[0] if r else '' for r in results[2]]
+                actions += [''] * (len(df) - len(actions))
+                if actions != _as_text(df['Action Took']).tolist():
+                    # assign() builds a new frame; the published snapshot keeps its column
+                    df = df.assign(**{'Action Took': pd.Categorical(actions)})
+                    changed = True
+
+            new_records = list(results[1])
+            if new_records:
+                new_df = parse_action_records(new_records, self.headers, self.last_row + 1)
+                parse_failures = merge_parse_failures(parse_failures, new_df.attrs['parse_failures'])
+                rollup = rollup.extend(new_df)
+                # Categoricals with different categories concat to object; re-encode them
+                df = categorize_columns(pd.concat([df, new_df], ignore_index=True))
+                changed = True
+
+            if changed:
+                self._publish(df, self.headers, parse_failures, rollup)
+            return self.snapshot
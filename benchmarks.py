@@ -0,0 +1,533 @@
+"""
+Benchmark harness for the hot paths behind both Streamlit apps.
+
+The data code lives in modules that do not import Streamlit (action_data,
+feedback_data, item_master, duplicate_index, bulk_entry, write_queue), so
+it is timed here exactly as the apps run it.
+
+Every benchmark runs outside Streamlit against synthetic data of a given
+size and records, per phase, the best wall time over `--repeat` runs and
+the peak memory allocated during one extra run (tracemalloc, which sees
+Python and numpy allocations; it is kept out of the timed runs).
+
+    python benchmarks.py                                  # all benchmarks, 1k/10k/100k rows
+    python benchmarks.py --sizes 1000 1000000 --only parse,filter_chain
+    python benchmarks.py --output bench.json              # save results
+    python benchmarks.py --output new.json --compare bench.json
+
+Where a benchmark replaced an older implementation, the old code is kept
+as a `*_baseline` phase (on a capped row count when it is quadratic), so
+the before/after difference can be reproduced from the same results file.
+
+With --compare, phases that got slower than --threshold (default 1.25x)
+are listed and the exit code is 1, so the run can gate a change.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from gspread.utils import a1_range_to_grid_range
+
+from action_data import (
+    FIRST_DATA_ROW, ROLLUP_DIMENSIONS, DateIndex, ItemsSnapshot, LossRollup, build_filter_mask, check_action_conflicts,
+    coalesce_cell_updates, matching_positions, overlay_changes, page_frame, parse_action_records,
+    resolve_overlay,
+)
+from bulk_entry import parse_scanner_text, prepare_bulk_items
+from duplicate_index import SubmissionKeyIndex, submission_key
+from feedback_data import FeedbackSnapshot, RatingRollup, parse_feedback_records
+from item_master import BarcodeIndex, ItemNameIndex, load_item_master, read_item_excel
+from local_sheets import LocalSheetsBackend
+from write_queue import SheetsWriteQueue
+
+ITEMS_HEADERS = [
+    "Date Submitted", "Form Type", "Barcode", "Item Name", "Qty", "Cost", "Selling",
+    "Amount", "GP%", "Expiry", "Supplier", "Remarks", "Outlet", "Staff Name",
+    "Action Took", "Unit", "CF",
+]
+OUTLETS = ["Hilal", "Safa Super", "Azhar HP", "Azhar", "Blue Pearl", "Fida", "Hadeqat", "Jais"]
+ACTIONS = ["", "Pending Review", "Ordered", "Completed"]
+NAME_WORDS = [
+    "MILK", "FRESH", "LABAN", "JUICE", "ORANGE", "APPLE", "RICE", "BASMATI", "SUGAR", "TEA",
+    "COFFEE", "GOLD", "CLASSIC", "CHICKEN", "FROZEN", "BREAD", "WHITE", "BROWN", "CHEESE", "WATER",
+]
+FEEDBACK_HEADERS = ["Customer Name", "Mobile Number", "Rating", "Outlet", "Feedback", "Submitted At"]
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+EXCEL_MAX_ROWS = 200_000  # Writing the workbook fixture dominates above this
+
+
+# ==========================================
+# SYNTHETIC DATA
+# ==========================================
+def make_item_master(n_rows, seed=0):
+    """Synthetic item master shaped like the ItemSearchList export."""
+    rng = random.Random(seed)
+    barcodes = [str(rng.randrange(10**12, 10**13)) for _ in range(n_rows)]
+    names = [f"{' '.join(rng.sample(NAME_WORDS, 3))} {rng.randint(1, 2000)}G" for _ in range(n_rows)]
+    return pd.DataFrame({
+        "Item Bar Code": barcodes,
+        "Item Name": names,
+        "LP Supplier": [f"SUPPLIER {i % 500}" for i in range(n_rows)],
+    })
+
+
+def make_items_records(n_rows, seed=0):
+    """Synthetic Items sheet rows (all strings, as get_all_values returns them)."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    records = []
+    for i in range(n_rows):
+        submitted = start + timedelta(minutes=7 * i)
+        expiry = submitted + timedelta(days=rng.randint(-30, 120))
+        cost = rng.uniform(1, 50)
+        selling = cost * rng.uniform(0.9, 1.6)
+        qty = rng.randint(1, 24)
+        records.append([
+            submitted.strftime("%Y-%m-%d %H:%M:%S"), rng.choice(["Expiry", "Damages", "Near Expiry"]),
+            str(rng.randrange(10**12, 10**13)), f"ITEM {i % 5000}", str(qty), f"{cost:.2f}",
+            f"{selling:.2f}", f"{cost * qty:.2f}", f"{(selling - cost) / cost * 100:.2f}",
+            expiry.strftime("%d-%b-%y"), f"SUPPLIER {i % 300}", "", rng.choice(OUTLETS),
+            f"STAFF {i % 40}", rng.choice(ACTIONS), "PCS", "1",
+        ])
+    return records
+
+
+def make_feedback_records(n_rows, seed=0):
+    """Synthetic Feedback sheet rows, one rating every 20 minutes."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        [f"CUSTOMER {i}", "N/A", str(rng.choice([1, 2, 3, 4, 4, 5, 5, 5])), rng.choice(OUTLETS), "Comment",
+         (start + timedelta(minutes=20 * i)).strftime("%Y-%m-%d %H:%M:%S")]
+        for i in range(n_rows)
+    ]
+
+
+def make_submission_row(outlet, i):
+    """One Items row as variance.py queues it (no 'Action Took', 'Unit' or 'CF')."""
+    return [
+        "2024-06-01 10:00:00", "Expiry", str(6290000000000 + i), f"ITEM {i}", 1, 2.5, 3.0,
+        2.5, 20.0, "01-Jul-24", "SUPPLIER 1", "", outlet, "STAFF 1",
+    ]
+
+
+class MemoryWorksheet:
+    """In-memory worksheet answering batch_get like the API (for the save path)."""
+
+    def __init__(self, headers, records):
+        self.title = "Items"
+        self.rows = [list(headers)] + [list(r) for r in records]
+
+    def row_values(self, row):
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def batch_get(self, ranges, **kwargs):
+        results = []
+        for a1 in ranges:
+            grid = a1_range_to_grid_range(a1)
+            first, last = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(self.rows))
+            c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+            results.append([row[c0:c1] for row in self.rows[first:last]])
+        return results
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def measure(fn, setup=None, repeat=3):
+    """
+    Best wall time of `fn(*setup())` over `repeat` runs, then the peak
+    memory of one more run under tracemalloc. `setup` (untimed) provides
+    fresh arguments to phases that consume their input.
+    Returns (result of the last timed run, seconds, peak bytes).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+# Each takes (n_rows, repeat) and returns {phase: {"seconds", "peak_bytes", ...extra}}.
+
+def _scan_lookup(item_data, barcode):
+    """The full-column scan variance.py used before BarcodeIndex."""
+    match = item_data[item_data["Item Bar Code"].astype(str).str.strip() == str(barcode).strip()]
+    return match.iloc[0] if not match.empty else None
+
+
+def bench_barcode_lookup(n_rows, repeat, n_scans=20):
+    item_data = make_item_master(n_rows)
+    probes = item_data["Item Bar Code"].sample(min(1000, n_rows), random_state=1).tolist()
+
+    index, build_s, build_peak = measure(lambda: BarcodeIndex(item_data), repeat=repeat)
+    _, lookup_s, lookup_peak = measure(lambda: [index.lookup(b) for b in probes], repeat=repeat)
+    scanned = probes[:n_scans]
+    _, scan_s, scan_peak = measure(lambda: [_scan_lookup(item_data, b) for b in scanned], repeat=repeat)
+    return {
+        "index_build": {"seconds": build_s, "peak_bytes": build_peak},
+        "lookup": {"seconds": lookup_s / len(probes), "peak_bytes": lookup_peak, "per": "lookup"},
+        "barcode_scan_baseline": {"seconds": scan_s / len(scanned), "peak_bytes": scan_peak, "per": "lookup"},
+    }
+
+
+def bench_item_name_search(n_rows, repeat):
+    item_data = make_item_master(n_rows)
+    queries = ["mi", "milk tea", "fresh juice 12", "supplier 42", "chiken frozn"]  # Last one is misspelled
+
+    index, build_s, build_peak = measure(lambda: ItemNameIndex(item_data), repeat=1)
+    index.search("warm up the trigram index")
+    _, search_s, search_peak = measure(lambda: [index.search(q) for q in queries], repeat=repeat)
+    return {
+        "index_build": {"seconds": build_s, "peak_bytes": build_peak},
+        "search": {"seconds": search_s / len(queries), "peak_bytes": search_peak, "per": "query"},
+    }
+
+
+def bench_excel_load(n_rows, repeat):
+    if n_rows > EXCEL_MAX_ROWS:
+        return {"skipped": f"above EXCEL_MAX_ROWS ({EXCEL_MAX_ROWS:,})"}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "items.xlsx")
+        make_item_master(n_rows).to_excel(path, index=False)
+        snapshot_dir = os.path.join(tmp, "snapshots")
+
+        _, excel_s, excel_peak = measure(lambda: read_item_excel(path), repeat=1)
+        load_item_master(path, snapshot_dir)  # Writes the snapshot
+        _, snap_s, snap_peak = measure(lambda: load_item_master(path, snapshot_dir), repeat=repeat)
+    return {
+        "read_workbook": {"seconds": excel_s, "peak_bytes": excel_peak},
+        "load_snapshot": {"seconds": snap_s, "peak_bytes": snap_peak},
+    }
+
+
+def bench_parse(n_rows, repeat):
+    records = make_items_records(n_rows)
+    df, parse_s, parse_peak = measure(lambda: parse_action_records(records, ITEMS_HEADERS), repeat=repeat)
+    _, snapshot_s, snapshot_peak = measure(lambda: ItemsSnapshot(df, ITEMS_HEADERS, 1), repeat=repeat)
+    return {
+        "parse_action_records": {"seconds": parse_s, "peak_bytes": parse_peak,
+                                 "frame_bytes": int(df.memory_usage(deep=True).sum())},
+        "build_snapshot": {"seconds": snapshot_s, "peak_bytes": snapshot_peak},
+    }
+
+
+def bench_filter_chain(n_rows, repeat):
+    df = parse_action_records(make_items_records(n_rows), ITEMS_HEADERS)
+    snapshot = ItemsSnapshot(df, ITEMS_HEADERS, 1)
+    rows = random.Random(3).sample(range(FIRST_DATA_ROW, n_rows + FIRST_DATA_ROW), min(100, n_rows))
+    overlay = resolve_overlay(snapshot, {row: "Ordered" for row in rows})
+    columns = [c for c in ITEMS_HEADERS if c not in ("Amount", "CF")] + ["GSHEET_ROW_INDEX"]
+    submitted = df["Date Submitted"]
+    date_range = (submitted.quantile(0.25).date(), submitted.quantile(0.75).date())
+    today = submitted.median()
+
+    _, index_s, index_peak = measure(lambda: DateIndex(df), repeat=repeat)
+
+    def filter_and_page():
+        mask = build_filter_mask(df, date_range=date_range, expiry_days=30, form_type="Expiry",
+                                 action_status="Ordered", today=today,
+                                 date_index=snapshot.date_index, overlay=overlay)
+        positions = matching_positions(df, mask, "item 1")
+        return page_frame(df, positions, columns, sort_by="Qty", descending=True,
+                          page=1, page_size=100, overlay=overlay)
+
+    page, chain_s, chain_peak = measure(filter_and_page, repeat=repeat)
+    return {
+        "date_index": {"seconds": index_s, "peak_bytes": index_peak},
+        "filter_search_sort_page": {"seconds": chain_s, "peak_bytes": chain_peak, "page_rows": len(page)},
+    }
+
+
+def bench_loss_rollup(n_rows, repeat):
+    records = make_items_records(n_rows + 100)
+    df = parse_action_records(records[:n_rows], ITEMS_HEADERS)
+    appended = parse_action_records(records[n_rows:], ITEMS_HEADERS, n_rows + FIRST_DATA_ROW)
+
+    rollup, build_s, build_peak = measure(lambda: LossRollup.from_frame(df), repeat=repeat)
+    _, extend_s, extend_peak = measure(lambda: rollup.extend(appended), repeat=repeat)
+    # A fresh rollup each run: summaries are memoized per rollup
+    _, summary_s, summary_peak = measure(
+        lambda r: [r.summary(by) for by in ROLLUP_DIMENSIONS], setup=lambda: (LossRollup(rollup.table),),
+        repeat=repeat)
+    return {
+        "build": {"seconds": build_s, "peak_bytes": build_peak, "groups": len(rollup.table)},
+        "extend_100_rows": {"seconds": extend_s, "peak_bytes": extend_peak},
+        "summaries": {"seconds": summary_s, "peak_bytes": summary_peak},
+    }
+
+
+def bench_feedback(n_rows, repeat):
+    records = make_feedback_records(n_rows + 100)
+    df = parse_feedback_records(records[:n_rows], FEEDBACK_HEADERS)
+    appended = parse_feedback_records(records[n_rows:], FEEDBACK_HEADERS, n_rows + FIRST_DATA_ROW)
+
+    _, parse_s, parse_peak = measure(lambda: parse_feedback_records(records[:n_rows], FEEDBACK_HEADERS), repeat=repeat)
+    snapshot, build_s, build_peak = measure(lambda: FeedbackSnapshot(df, FEEDBACK_HEADERS, 1), repeat=repeat)
+    _, extend_s, extend_peak = measure(lambda: snapshot.rollup.extend(appended), repeat=repeat)
+    _, low_s, low_peak = measure(lambda: snapshot.low_ratings(outlet=OUTLETS[0], limit=200), repeat=repeat)
+    _, summary_s, summary_peak = measure(
+        lambda r: (r.by_outlet(), r.by_day(OUTLETS[0])), setup=lambda: (RatingRollup(snapshot.rollup.table),),
+        repeat=repeat)
+    return {
+        "parse": {"seconds": parse_s, "peak_bytes": parse_peak},
+        "build_snapshot": {"seconds": build_s, "peak_bytes": build_peak},
+        "extend_100_rows": {"seconds": extend_s, "peak_bytes": extend_peak},
+        "summaries": {"seconds": summary_s, "peak_bytes": summary_peak},
+        "low_ratings": {"seconds": low_s, "peak_bytes": low_peak},
+    }
+
+
+def bench_duplicate_index(n_rows, repeat):
+    # Dated up to today, so the index keeps the most recent RECENT_DAYS of them
+    records = make_items_records(n_rows)
+    shift = datetime.now() - datetime.strptime(records[-1][0], "%Y-%m-%d %H:%M:%S")
+    for record in records:
+        record[0] = (datetime.strptime(record[0], "%Y-%m-%d %H:%M:%S") + shift).strftime("%Y-%m-%d %H:%M:%S")
+    worksheet = MemoryWorksheet(ITEMS_HEADERS, records)
+    probes = [submission_key(dict(zip(ITEMS_HEADERS, r))) for r in random.Random(4).sample(records, min(1000, n_rows))]
+
+    def build():
+        index = SubmissionKeyIndex(worksheet)
+        index.refresh()
+        return index
+
+    index, build_s, build_peak = measure(build, repeat=repeat)
+    _, check_s, check_peak = measure(lambda: [key in index for key in probes], repeat=repeat)
+    return {
+        "build": {"seconds": build_s, "peak_bytes": build_peak, "keys": len(index)},
+        "check": {"seconds": check_s / len(probes), "peak_bytes": check_peak, "per": "key"},
+    }
+
+
+def bench_bulk_ingest(n_rows, repeat, n_scans=5000):
+    # A scanner dump checked against an item master of n_rows; 1 in 20 scans is unknown
+    item_data = make_item_master(n_rows)
+    index = BarcodeIndex(item_data)
+    rng = random.Random(5)
+    barcodes = item_data["Item Bar Code"].tolist()
+    lines = [f"{rng.choice(barcodes) if i % 20 else 900000000 + i},{rng.randint(1, 5)},31-Dec-26,{rng.randint(1, 50)}"
+             for i in range(n_scans)]
+    text = "\n".join(lines)
+    submitted_at = datetime(2026, 1, 1)
+
+    entries, parse_s, parse_peak = measure(lambda: parse_scanner_text(text), repeat=repeat)
+    (items, problems), join_s, join_peak = measure(
+        lambda: prepare_bulk_items(entries, item_data, index, "Expiry", "Outlet 1", "Staff", submitted_at),
+        repeat=repeat,
+    )
+    return {
+        "parse": {"seconds": parse_s, "peak_bytes": parse_peak, "scans": n_scans},
+        "join": {"seconds": join_s, "peak_bytes": join_peak, "items": len(items), "problems": len(problems)},
+    }
+
+
+def _iterrows_save_diff(df_original, df_edited):
+    """The row-by-row diff managers.py used before the overlay (one mask over every row per row: O(N^2))."""
+    action_col_index = df_original.columns.get_loc('Action Took') + 1
+    updates = []
+    for _, row_edited in df_edited.iterrows():
+        match = df_original[df_original['GSHEET_ROW_INDEX'] == row_edited['GSHEET_ROW_INDEX']]
+        if match.empty:
+            continue
+        if str(row_edited['Action Took']) != str(match.iloc[0]['Action Took']):
+            updates.append((int(row_edited['GSHEET_ROW_INDEX']), action_col_index))
+    return updates
+
+
+def bench_save_diff(n_rows, repeat, baseline_rows=2_000):
+    records = make_items_records(n_rows)
+    df = parse_action_records(records, ITEMS_HEADERS)
+    snapshot = ItemsSnapshot(df, ITEMS_HEADERS, 1)
+    worksheet = MemoryWorksheet(ITEMS_HEADERS, records)
+    # Up to 500 edits: half one contiguous block, the rest scattered
+    n_changed = min(500, n_rows // 2)
+    block = list(range(FIRST_DATA_ROW, FIRST_DATA_ROW + n_changed // 2))
+    scattered = random.Random(2).sample(range(FIRST_DATA_ROW + len(block), n_rows + FIRST_DATA_ROW),
+                                        n_changed - len(block))
+    overlay = {row: "Completed (bench)" for row in block + scattered}
+    action_col = ITEMS_HEADERS.index("Action Took") + 1
+
+    def diff():
+        return coalesce_cell_updates(overlay_changes(snapshot, overlay), action_col)
+
+    updates, diff_s, diff_peak = measure(diff, repeat=repeat)
+    changes = overlay_changes(snapshot, overlay)
+    (_, conflicts), check_s, check_peak = measure(
+        lambda: check_action_conflicts(worksheet, snapshot, changes), repeat=repeat)
+
+    # The old loop only on the first rows: at 100k rows it would take hours
+    original = df.head(baseline_rows).astype({'Action Took': object})
+    edited = original.copy()
+    edited.loc[edited['GSHEET_ROW_INDEX'].isin(overlay).to_numpy(), 'Action Took'] = "Completed (bench)"
+    _, iterrows_s, iterrows_peak = measure(lambda: _iterrows_save_diff(original, edited), repeat=1)
+    return {
+        "overlay_diff": {"seconds": diff_s, "peak_bytes": diff_peak,
+                         "changed_cells": len(changes), "batch_ranges": len(updates)},
+        "conflict_check": {"seconds": check_s, "peak_bytes": check_peak, "conflicts": len(conflicts)},
+        "save_diff_iterrows_baseline": {"seconds": iterrows_s, "peak_bytes": iterrows_peak,
+                                        "rows_timed": len(original)},
+    }
+
+
+def bench_submission_batching(n_rows, repeat, rows_per_submission=10):
+    headers = [h for h in ITEMS_HEADERS if h not in ("Action Took", "Unit", "CF")]
+    submissions = [
+        [make_submission_row(OUTLETS[s % len(OUTLETS)], s * rows_per_submission + i)
+         for i in range(rows_per_submission)]
+        for s in range(max(1, n_rows // rows_per_submission))
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = iter(range(10**6))
+
+        def fresh_queue():
+            # Each run gets its own sheet and outbox; the background thread never fires
+            run_id = next(runs)
+            backend = LocalSheetsBackend(path=os.path.join(tmp, f"sheet{run_id}.db"))
+            backend.worksheet("Items").append_row(headers)
+            return (SheetsWriteQueue(backend, path=os.path.join(tmp, f"outbox{run_id}.db"), flush_interval=3600),)
+
+        def enqueue_all(queue):
+            for rows in submissions:
+                queue.enqueue("Items", headers, rows)
+            return queue
+
+        def flush(queue):
+            before = len(queue.backend._calls["write"])
+            queue.flush()
+            return len(queue.backend._calls["write"]) - before
+
+        _, enqueue_s, enqueue_peak = measure(enqueue_all, setup=fresh_queue, repeat=repeat)
+        writes, flush_s, flush_peak = measure(
+            flush, setup=lambda: (enqueue_all(*fresh_queue()),), repeat=repeat)
+    return {
+        "enqueue": {"seconds": enqueue_s, "peak_bytes": enqueue_peak, "submissions": len(submissions)},
+        "flush": {"seconds": flush_s, "peak_bytes": flush_peak, "sheet_writes": writes},
+    }
+
+
+BENCHMARKS = {
+    "barcode_lookup": bench_barcode_lookup,
+    "item_name_search": bench_item_name_search,
+    "excel_load": bench_excel_load,
+    "parse": bench_parse,
+    "filter_chain": bench_filter_chain,
+    "loss_rollup": bench_loss_rollup,
+    "feedback": bench_feedback,
+    "duplicate_index": bench_duplicate_index,
+    "bulk_ingest": bench_bulk_ingest,
+    "save_diff": bench_save_diff,
+    "submission_batching": bench_submission_batching,
+}
+
+
+# ==========================================
+# RESULTS
+# ==========================================
+def environment():
+    """Where the numbers came from, so result files can be compared fairly."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def run(names, sizes, repeat):
+    results = []
+    for name in names:
+        for n_rows in sizes:
+            phases = BENCHMARKS[name](n_rows, repeat)
+            if "skipped" in phases:
+                print(f"{name:<20} {n_rows:>9,}  skipped: {phases['skipped']}")
+                continue
+            for phase, metrics in phases.items():
+                results.append({"benchmark": name, "rows": n_rows, "phase": phase, **metrics})
+                per = f"/{metrics['per']}" if "per" in metrics else ""
+                print(f"{name:<20} {n_rows:>9,}  {phase:<28} {metrics['seconds'] * 1e3:>10.3f} ms{per:<8}"
+                      f" peak {metrics['peak_bytes'] / 2**20:>8.1f} MiB")
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds=1e-3):
+    """Phases slower than `threshold` x the baseline (ignoring ones under `min_seconds` in both)."""
+    old = {(r["benchmark"], r["rows"], r["phase"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = old.get((r["benchmark"], r["rows"], r["phase"]))
+        if before is None or max(before["seconds"], r["seconds"]) < min_seconds:
+            continue
+        ratio = r["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        if ratio > threshold:
+            regressions.append((r["benchmark"], r["rows"], r["phase"], before["seconds"], r["seconds"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to run at")
+    parser.add_argument("--only", default="", help="comma-separated benchmarks: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per phase (best is kept)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = run(names, args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+        print(f"Saved {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, n_rows, phase, before, after, ratio in regressions:
+            print(f"REGRESSION {name} {n_rows:,} {phase}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.2f}x against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Bulk item entry for the outlet dashboard (variance.py).
+
+A whole expiry sweep is read at once, from an uploaded CSV or from text
+pasted out of a barcode scanner, instead of one lookup and one form per
+item. Lines repeating the same item are added up (merge_repeats), all
+rows are joined to the item master in a single vectorized lookup
+(BarcodeIndex.lookup_many), and Amount and GP% are computed as whole
+columns. A blank cost is taken from the item master where it has one.
+Rows that cannot be used are returned with the reason, so staff can
+correct them and check again; rows still without a cost can be added, as
+in the single-item form, but are listed with a warning.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from item_master import normalize_barcodes
+
+# Input columns, all read as text. Only Barcode is required; Item Name and
+# Supplier are for barcodes that are not in the item master.
+BULK_COLUMNS = ["Barcode", "Qty", "Expiry", "Cost", "Selling", "Remarks", "Item Name", "Supplier"]
+# Accepted CSV header spellings (case-insensitive) for each input column
+COLUMN_ALIASES = {
+    "Barcode": ["barcode", "item bar code", "bar code", "ean", "code"],
+    "Qty": ["qty", "quantity", "pcs"],
+    "Expiry": ["expiry", "expiry date", "exp", "best before"],
+    "Cost": ["cost", "cost price"],
+    "Selling": ["selling", "selling price", "price"],
+    "Remarks": ["remarks", "remark", "notes"],
+    "Item Name": ["item name", "name", "description"],
+    "Supplier": ["supplier", "lp supplier"],
+}
+# Tried in order, each only on the cells earlier formats could not parse
+EXPIRY_FORMATS = ["%d-%b-%y", "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d %b %Y", "%d-%b-%Y"]
+# Problem text of rows that can be added but are listed for staff to check
+WARNING_PREFIX = "Warning: "
+# Column order of the dashboard's item list (see process_item_entry in variance.py)
+ITEM_COLUMNS = [
+    "Date Submitted", "Form Type", "Barcode", "Item Name", "Qty", "Cost", "Selling",
+    "Amount", "GP%", "Expiry", "Supplier", "Remarks", "Outlet", "Staff Name",
+]
+
+
+def _blank_frame(n_rows=0):
+    return pd.DataFrame({col: pd.Series([""] * n_rows, dtype=object) for col in BULK_COLUMNS})
+
+
+def _clean(df):
+    """`df` with exactly BULK_COLUMNS as stripped text ('' for missing cells)."""
+    df = df.reindex(columns=BULK_COLUMNS)
+    return df.astype(object).where(df.notna(), "").astype(str).apply(lambda col: col.str.strip()).astype(object)
+
+
+def merge_repeats(entries):
+    """
+    `entries` with rows that repeat the same barcode, expiry and other details
+    combined into one row holding the total Qty (a blank Qty counts as 1).
+    Rows with an unreadable Qty are kept as they are, for the staff to fix.
+    """
+    entries = _clean(entries)
+    qty = pd.to_numeric(entries["Qty"].replace("", "1"), errors="coerce")
+    counted = qty.notna().to_numpy()
+    if not counted.any():
+        return entries
+    details = [col for col in BULK_COLUMNS if col != "Qty"]
+    summed = (entries[counted].assign(Qty=qty[counted])
+              .groupby(details, sort=False, as_index=False)["Qty"].sum())
+    summed["Qty"] = summed["Qty"].map(lambda q: str(int(q)) if float(q).is_integer() else str(q))
+    return _clean(pd.concat([summed, entries[~counted]], ignore_index=True))
+
+
+def parse_scanner_text(text):
+    """
+    Rows of pasted scanner output, one scan per line: "barcode", optionally
+    followed by qty, expiry, cost and selling, separated by commas,
+    semicolons, tabs or spaces. A line without a qty counts as one unit, and
+    repeated scans of the same item are added up.
+    """
+    rows = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        parts = [p.strip() for p in re.split(r"[,;\t]", line)] if re.search(r"[,;\t]", line) else line.split()
+        rows.append((parts + [""] * 4)[:5])
+    if not rows:
+        return _blank_frame()
+    return merge_repeats(pd.DataFrame(rows, columns=["Barcode", "Qty", "Expiry", "Cost", "Selling"], dtype=object))
+
+
+def read_bulk_csv(file):
+    """
+    Rows of an uploaded CSV, with columns matched to BULK_COLUMNS by header
+    name (see COLUMN_ALIASES). A file whose header names no barcode column is
+    read as headerless barcode, qty, expiry, cost, selling columns. Repeated
+    lines of the same item are added up, as for scanner paste.
+    """
+    df = pd.read_csv(file, dtype=str, keep_default_na=False, skipinitialspace=True)
+    by_alias = {alias: col for col, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    renamed = {}
+    for header in df.columns:
+        col = by_alias.get(str(header).strip().lower())
+        if col is not None and col not in renamed.values():
+            renamed[header] = col
+    if "Barcode" not in renamed.values():
+        if hasattr(file, "seek"):
+            file.seek(0)
+        df = pd.read_csv(file, dtype=str, keep_default_na=False, skipinitialspace=True, header=None)
+        renamed = dict(zip(df.columns[:5], ["Barcode", "Qty", "Expiry", "Cost", "Selling"]))
+    return merge_repeats(df.rename(columns=renamed))
+
+
+def _parse_expiry(raw):
+    """(datetime Series, invalid mask); blank cells are NaT but not invalid."""
+    values = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+    todo = (raw != "").to_numpy().copy()
+    for fmt in EXPIRY_FORMATS:
+        if not todo.any():
+            break
+        values[todo] = pd.to_datetime(raw[todo], format=fmt, errors="coerce")
+        todo = todo & values.isna().to_numpy()
+    return values, todo
+
+
+def _format_days(values):
+    """'%d-%b-%y' text of each date ('' for NaT); a sweep has few distinct dates, so each is formatted once."""
+    days = pd.Series(values.dropna().unique())
+    return values.map(dict(zip(days, days.dt.strftime("%d-%b-%y")))).fillna("").to_numpy()
+
+
+def prepare_bulk_items(entries, item_data, barcode_index, form_type, outlet_name, staff_name, submitted_at):
+    """
+    Joins `entries` (see BULK_COLUMNS) to the item master and builds list
+    items for every usable row. Returns (items DataFrame with ITEM_COLUMNS,
+    problems DataFrame: the unusable entries and the usable ones with a
+    warning, plus 'Master Item' and 'Problem' columns). Warned rows are in
+    both, under the same index; their Problem starts with WARNING_PREFIX.
+    """
+    entries = _clean(entries)
+    if entries.empty:
+        return pd.DataFrame(columns=ITEM_COLUMNS), entries.assign(**{"Master Item": pd.Series(dtype=object),
+                                                                      "Problem": pd.Series(dtype=object)})
+
+    # One join for every row: normalized barcode -> item master position
+    positions = barcode_index.lookup_many(entries["Barcode"])
+    found = positions >= 0
+    take = np.maximum(positions, 0)
+    # Only the matched master rows are converted to text, not the whole master
+    master_names = item_data["Item Name"].to_numpy()[take].astype(str) if len(item_data) else np.full(len(entries), "")
+    master_suppliers = item_data["LP Supplier"].to_numpy()[take].astype(str) if len(item_data) else np.full(len(entries), "")
+    master_costs = (pd.to_numeric(pd.Series(item_data["Cost"].to_numpy()[take]), errors="coerce").to_numpy()
+                    if len(item_data) and "Cost" in item_data.columns else np.full(len(entries), np.nan))
+    typed_name = entries["Item Name"] != ""
+    names = np.where(typed_name, entries["Item Name"], np.where(found, master_names, ""))
+    suppliers = np.where(entries["Supplier"] != "", entries["Supplier"], np.where(found, master_suppliers, ""))
+
+    qty = pd.to_numeric(entries["Qty"].replace("", "1"), errors="coerce")
+    cost = pd.to_numeric(entries["Cost"].replace("", "0"), errors="coerce")
+    cost = cost.mask((entries["Cost"] == "").to_numpy() & found & (master_costs > 0), master_costs)
+    selling = pd.to_numeric(entries["Selling"].replace("", "0"), errors="coerce")
+    expiry, bad_expiry = _parse_expiry(entries["Expiry"])
+    needs_expiry = form_type != "Damages"
+    expiry_text = _format_days(expiry) if needs_expiry else np.full(len(entries), "")
+    # Two rows for the same item would be one submission key: the second would be skipped as a duplicate
+    item_keys = pd.Series(normalize_barcodes(entries["Barcode"]).to_numpy() + "|" + expiry_text, index=entries.index)
+
+    # First problem found for each row, in the order staff would fix them
+    checks = [
+        (entries["Barcode"] == "", "Barcode is empty"),
+        (~found & ~typed_name, "Barcode not in item master: enter Item Name (and Supplier)"),
+        (item_keys.duplicated(keep=False) & (entries["Barcode"] != ""),
+         "Same barcode and expiry as another row: combine them into one row"),
+        (qty.isna() | (qty < 1) | (qty % 1 != 0), "Qty must be a whole number of at least 1"),
+        (cost.isna() | (cost < 0), "Cost is not a number"),
+        (selling.isna() | (selling < 0), "Selling is not a number"),
+        (pd.Series(bad_expiry, index=entries.index), "Expiry date not recognised (e.g. 31-Dec-25)"),
+        (expiry.isna() & ~pd.Series(bad_expiry, index=entries.index) & needs_expiry, "Expiry date is missing"),
+    ]
+    problem = pd.Series("", index=entries.index, dtype=object)
+    for failed, message in reversed(checks):
+        problem = problem.mask(failed.to_numpy(), message)
+    ok = (problem == "").to_numpy()
+    # Usable, but shown with the problems so staff can still correct it
+    problem = problem.mask(ok & (cost == 0).to_numpy(),
+                           WARNING_PREFIX + "no cost, so Amount and GP% are 0 (enter the unit cost)")
+
+    cost, selling, qty = cost.fillna(0).to_numpy(), selling.fillna(0).to_numpy(), qty.fillna(0).to_numpy()
+    gp = np.divide((selling - cost) * 100, cost, out=np.zeros(len(cost)), where=cost > 0)
+    items = pd.DataFrame({
+        "Date Submitted": submitted_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "Form Type": form_type,
+        "Barcode": entries["Barcode"].to_numpy(),
+        "Item Name": names,
+        "Qty": qty.astype(np.int64),
+        "Cost": np.round(cost, 2),
+        "Selling": np.round(selling, 2),
+        "Amount": np.round(cost * qty, 2),
+        "GP%": np.round(gp, 2),
+        "Expiry": expiry_text,
+        "Supplier": suppliers,
+        "Remarks": entries["Remarks"].to_numpy(),
+        "Outlet": outlet_name,
+        "Staff Name": staff_name.strip(),
+    }, index=entries.index, columns=ITEM_COLUMNS)
+    # Rows to fix also show the item master's name, so staff can tell them apart
+    problems = entries.assign(**{"Master Item": np.where(found, master_names, ""), "Problem": problem})
+    return items[ok], problems[(problem != "").to_numpy()]
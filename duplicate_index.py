@@ -0,0 +1,125 @@
+"""
+Duplicate-submission detection for the outlet dashboard (variance.py).
+
+A submission key is (outlet, barcode, expiry, form type, day submitted).
+SubmissionKeyIndex holds the keys of the last few days in memory: it reads
+the key columns of the Items sheet once, then only the rows appended since
+(one batch_get, at most every `max_age` seconds). Rows still waiting in the
+local write queue are added by the caller, so a key is known from the
+moment it is queued. Membership checks are set lookups and never touch
+the sheet.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from action_data import FIRST_DATA_ROW, column_letter
+from item_master import normalize_barcode
+
+KEY_COLUMNS = ["Outlet", "Barcode", "Expiry", "Form Type", "Date Submitted"]
+RECENT_DAYS = 7        # Keys older than this are dropped from the index
+REFRESH_SECONDS = 30   # Minimum gap between reads of newly appended sheet rows
+
+
+def submission_key(row):
+    """Key of one submission, given a {column name: value} mapping of an Items row."""
+    def text(col):
+        value = row.get(col)
+        return "" if value is None else str(value).strip()
+
+    return (
+        text("Outlet").lower(),
+        normalize_barcode(text("Barcode")),
+        text("Expiry").upper(),
+        text("Form Type").lower(),
+        text("Date Submitted")[:10],  # 'YYYY-MM-DD HH:MM:SS' -> day
+    )
+
+
+class SubmissionKeyIndex:
+    """
+    - worksheet: the Items worksheet (see sheets.py)
+    - recent_days: how many days of keys to keep
+    - max_age: seconds a refresh is skipped for after the previous one
+    """
+
+    def __init__(self, worksheet, recent_days=RECENT_DAYS, max_age=REFRESH_SECONDS):
+        self.worksheet = worksheet
+        self.recent_days = recent_days
+        self.max_age = max_age
+        self._days = {}  # 'YYYY-MM-DD' -> set of keys submitted that day
+        self._headers = None
+        self._last_row = FIRST_DATA_ROW - 1
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._days.get(key[-1], ())
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._days.values())
+
+    def _cutoff(self):
+        return (datetime.now() - timedelta(days=self.recent_days)).strftime("%Y-%m-%d")
+
+    def add(self, keys):
+        """Records keys of rows that were just queued (or read from the sheet)."""
+        cutoff = self._cutoff()
+        with self._lock:
+            for key in keys:
+                if key[-1] >= cutoff:
+                    self._days.setdefault(key[-1], set()).add(key)
+
+    def add_rows(self, headers, rows):
+        """Records the keys of `rows` (lists ordered like `headers`) submitted in the last recent_days."""
+        if "Date Submitted" in headers:
+            # Old rows are skipped on their date text alone, before any key is built
+            pos, cutoff = headers.index("Date Submitted"), self._cutoff()
+            rows = (row for row in rows if len(row) > pos and str(row[pos])[:10] >= cutoff)
+        self.add(submission_key(dict(zip(headers, row))) for row in rows)
+
+    def refresh(self, force=False):
+        """Reads rows appended to the sheet since the last refresh (skipped if one ran < max_age ago)."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.max_age:
+                return
+            self._refreshed_at = now
+            headers = self._headers
+        if headers is None:
+            self._build()
+            return
+
+        last_col = column_letter(len(headers))
+        header_rows, new_rows = self.worksheet.batch_get(["1:1", f"A{self._last_row + 1}:{last_col}"])
+        if (list(header_rows[0]) if header_rows else []) != headers:
+            # Columns moved: read the key columns again
+            self._build()
+            return
+        self._last_row += len(new_rows)
+        self.add_rows(headers, new_rows)
+        self._prune()
+
+    def _build(self):
+        """Reads only the key columns of the sheet (one row_values and one batch_get)."""
+        headers = self.worksheet.row_values(1)
+        present = [col for col in KEY_COLUMNS if col in headers]
+        columns = []
+        if present and headers:
+            letters = [column_letter(headers.index(col) + 1) for col in present]
+            results = self.worksheet.batch_get([f"{letter}{FIRST_DATA_ROW}:{letter}" for letter in letters])
+            columns = [[cells[0] if cells else "" for cells in values] for values in results]
+        n_rows = max((len(values) for values in columns), default=0)
+        columns = [values + [""] * (n_rows - len(values)) for values in columns]
+
+        # Keys already held (e.g. queued rows) are kept; re-read ones are set no-ops
+        with self._lock:
+            self._headers = headers or None  # Empty sheet: look again next time
+            self._last_row = FIRST_DATA_ROW - 1 + n_rows
+        self.add_rows(present, zip(*columns))
+
+    def _prune(self):
+        cutoff = self._cutoff()
+        with self._lock:
+            for day in [day for day in self._days if day < cutoff]:
+                del self._days[day]
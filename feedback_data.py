@@ -0,0 +1,206 @@
+"""
+Feedback sheet loading for the manager dashboard (managers.py).
+
+variance.py appends one row per customer rating to the Feedback worksheet
+and nothing edits them afterwards, so the sheet is mirrored append-only:
+rating counts and the low-rating index are extended with each batch of new
+rows instead of being recomputed over the whole history.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from action_data import FIRST_DATA_ROW, column_letter, pad_rows
+
+RATINGS = [1, 2, 3, 4, 5]
+LOW_RATING = 2  # Ratings at or below this are complaints to triage
+SUBMITTED_FORMAT = '%Y-%m-%d %H:%M:%S'  # What variance.py writes to 'Submitted At'
+
+
+def parse_feedback_records(records, headers, first_row=FIRST_DATA_ROW):
+    """
+    Typed frame of raw Feedback rows: 'Rating' as int8 (0 when blank or not
+    1-5), 'Submitted At' as datetime plus its day in 'DAY', 'Outlet' as text.
+    `first_row` is the sheet row number of records[0].
+    """
+    df = pd.DataFrame(pad_rows(records, len(headers)), columns=headers, dtype=object)
+
+    rating = pd.to_numeric(df['Rating'], errors='coerce') if 'Rating' in df.columns else pd.Series(np.nan, index=df.index)
+    df['Rating'] = rating.where(rating.isin(RATINGS), 0).astype('int8')
+    submitted = df['Submitted At'] if 'Submitted At' in df.columns else pd.Series('', index=df.index)
+    df['Submitted At'] = pd.to_datetime(submitted, format=SUBMITTED_FORMAT, errors='coerce')
+    df['DAY'] = df['Submitted At'].dt.normalize()
+    df['Outlet'] = df['Outlet'].fillna('').astype(str).str.strip() if 'Outlet' in df.columns else ''
+    df['GSHEET_ROW_INDEX'] = np.arange(first_row, first_row + len(df), dtype='int64')
+    return df
+
+
+# --- Rating rollups: counts per outlet and day ---
+def _rating_counts(df):
+    """Number of 1..5 star ratings per (Outlet, DAY) for the rows of `df`."""
+    rated = df[df['Rating'] > 0]
+    counts = (
+        rated.groupby(['Outlet', 'DAY', 'Rating'], dropna=False, sort=False).size()
+        .unstack('Rating', fill_value=0)
+        .reindex(columns=RATINGS, fill_value=0)
+        .astype('int64')
+    )
+    counts.columns.name = None
+    return counts
+
+
+def _with_averages(counts):
+    """Adds 'Ratings' (total) and 'Average' columns to a frame of 1..5 star counts."""
+    counts = counts.copy()
+    counts['Ratings'] = counts[RATINGS].sum(axis=1)
+    stars = counts[RATINGS].to_numpy() @ np.array(RATINGS)
+    counts['Average'] = np.where(counts['Ratings'] > 0, stars / counts['Ratings'].clip(lower=1), np.nan)
+    return counts
+
+
+class RatingRollup:
+    """
+    Running 1..5 star counts per (outlet, day). `extend` groups only the
+    new rows and re-aggregates only the days they fall on, so refreshes do
+    not rescan the feedback history. Averages and distributions per outlet
+    or per day are derived from the counts. Never modified in place:
+    `extend` returns a new rollup.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._summaries = {}  # Memoized by arguments; safe as the table never changes
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(_rating_counts(df))
+
+    def extend(self, new_rows):
+        if new_rows.empty:
+            return self
+        added = _rating_counts(new_rows)
+        days = self.table.index.get_level_values('DAY')
+        touched = days.isin(added.index.get_level_values('DAY').unique())
+        merged = pd.concat([self.table[touched], added]).groupby(level=['Outlet', 'DAY'], dropna=False, sort=False).sum()
+        return RatingRollup(pd.concat([self.table[~touched], merged]))
+
+    def _between(self, start, end, outlet=None):
+        table = self.table
+        keep = np.ones(len(table), dtype=bool)
+        if start is not None or end is not None:
+            days = table.index.get_level_values('DAY')
+            keep &= days.notna()
+            if start is not None:
+                keep &= days >= pd.Timestamp(start)
+            if end is not None:
+                keep &= days <= pd.Timestamp(end)
+        if outlet is not None:
+            keep &= table.index.get_level_values('Outlet') == outlet
+        return table[keep]
+
+    def by_outlet(self, start=None, end=None):
+        """Per-outlet counts, total and average for days in [start, end], lowest average first."""
+        key = ('outlet', start, end)
+        if key not in self._summaries:
+            totals = self._between(start, end).groupby(level='Outlet', sort=False).sum()
+            self._summaries[key] = _with_averages(totals).sort_values('Average').reset_index()
+        return self._summaries[key]
+
+    def by_day(self, outlet=None, start=None, end=None):
+        """Per-day counts, total and average (one outlet or all), in date order."""
+        key = ('day', outlet, start, end)
+        if key not in self._summaries:
+            totals = self._between(start, end, outlet).groupby(level='DAY').sum()
+            self._summaries[key] = _with_averages(totals).reset_index()
+        return self._summaries[key]
+
+
+class FeedbackSnapshot:
+    """
+    One immutable, versioned copy of the Feedback sheet with its rating
+    rollup and the positions of low ratings (<= LOW_RATING) in sheet
+    order, so the triage list only ever looks at complaints.
+    """
+
+    def __init__(self, df, headers, version, rollup=None, low_positions=None):
+        self.df = df
+        self.headers = headers
+        self.version = version
+        self.rollup = rollup if rollup is not None else RatingRollup.from_frame(df)
+        if low_positions is None:
+            low_positions = np.flatnonzero(_is_low(df))
+        self.low_positions = low_positions
+
+    @classmethod
+    def empty(cls):
+        return cls(parse_feedback_records([], []), [], 0)
+
+    def low_ratings(self, outlet=None, start=None, end=None, limit=None):
+        """Rows rated 1..LOW_RATING, optionally for one outlet and day range, latest appended first."""
+        low = self.df.iloc[self.low_positions[::-1]]
+        keep = np.ones(len(low), dtype=bool)
+        if outlet is not None:
+            keep &= (low['Outlet'] == outlet).to_numpy()
+        if start is not None:
+            keep &= (low['DAY'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            keep &= (low['DAY'] <= pd.Timestamp(end)).to_numpy()
+        low = low[keep]
+        return low if limit is None else low.head(limit)
+
+
+def _is_low(df):
+    return ((df['Rating'] >= 1) & (df['Rating'] <= LOW_RATING)).to_numpy()
+
+
+class FeedbackSheetSync:
+    """
+    Process-wide append-only mirror of the Feedback sheet. After the first
+    full download, `refresh` makes one batch_get for the header row (a
+    layout change triggers a full reload) and the rows after the last one
+    seen. New rows extend the rollup and the low-rating positions, and a
+    new FeedbackSnapshot is published.
+    """
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.snapshot = FeedbackSnapshot.empty()
+        self._lock = threading.Lock()
+
+    @property
+    def last_row(self):
+        """Sheet row number of the last data row held (1 when only headers)."""
+        return FIRST_DATA_ROW - 1 + len(self.snapshot.df)
+
+    def full_reload(self):
+        data = self.worksheet.get_all_values()
+        headers = data[0] if data else []
+        df = parse_feedback_records(data[1:], headers)
+        self.snapshot = FeedbackSnapshot(df, headers, self.snapshot.version + 1)
+
+    def refresh(self):
+        """Brings the mirror up to date and returns the current FeedbackSnapshot."""
+        with self._lock:
+            snapshot = self.snapshot
+            if not snapshot.headers:
+                self.full_reload()
+                return self.snapshot
+
+            last_col = column_letter(len(snapshot.headers))
+            header_rows, new_records = self.worksheet.batch_get(["1:1", f"A{self.last_row + 1}:{last_col}"])
+            if (list(header_rows[0]) if header_rows else []) != snapshot.headers:
+                self.full_reload()
+                return self.snapshot
+
+            if new_records:
+                new_df = parse_feedback_records(list(new_records), snapshot.headers, self.last_row + 1)
+                self.snapshot = FeedbackSnapshot(
+                    pd.concat([snapshot.df, new_df], ignore_index=True),
+                    snapshot.headers,
+                    snapshot.version + 1,
+                    rollup=snapshot.rollup.extend(new_df),
+                    low_positions=np.concatenate([snapshot.low_positions,
+                                                  np.flatnonzero(_is_low(new_df)) + len(snapshot.df)]),
+                )
+            return self.snapshot
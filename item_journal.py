@@ -0,0 +1,138 @@
+"""
+Durable journal of the in-progress item list on the outlet dashboard (variance.py).
+
+Every item added to the list and every item removed from it is appended to
+a local SQLite journal (WAL mode), keyed by outlet and staff name, before
+the session list changes. A dropped connection or a server restart loses
+only the browser session: the open list is rebuilt from the journal the
+next time the same outlet and staff name are used.
+
+"Submit All" queues the open entries with a submission id derived from
+their entry ids and then records a 'commit' for each of them. If the
+commit never lands, the retry queues the same id again, which the write
+queue ignores (see SheetsWriteQueue.enqueue), so rows are never duplicated.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+ADD = "add"
+DELETE = "delete"
+COMMIT = "commit"
+
+
+class ItemJournal:
+    """
+    - path: SQLite journal file
+    Entries are never updated or removed; an entry is open while it has an
+    'add' and neither a 'delete' nor a 'commit'.
+    """
+
+    def __init__(self, path="item_journal.db"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " outlet TEXT NOT NULL,"
+            " staff TEXT NOT NULL,"
+            " op TEXT NOT NULL,"
+            " entry_id TEXT NOT NULL,"
+            " item TEXT,"
+            " submission_id TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS journal_owner ON journal (outlet, staff, op, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS journal_entry ON journal (entry_id, op)")
+        self._db.commit()
+
+    @staticmethod
+    def owner(outlet, staff):
+        """Journal key of a list: the outlet and the normalized staff name."""
+        # Staff names are typed by hand; "Ali " and "ali" are the same person's list
+        return outlet, staff.strip().lower()
+
+    def record_add(self, outlet, staff, item):
+        """Journals one list item (a dict) and returns its entry id."""
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO journal (outlet, staff, op, entry_id, item, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*self.owner(outlet, staff), ADD, entry_id, json.dumps(item, default=str), time.time()),
+            )
+            self._db.commit()
+        return entry_id
+
+    def record_adds(self, outlet, staff, items):
+        """Journals several list items in one transaction and returns their entry ids."""
+        entry_ids = [uuid.uuid4().hex for _ in items]
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO journal (outlet, staff, op, entry_id, item, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*self.owner(outlet, staff), ADD, entry_id, json.dumps(item, default=str), now)
+                 for entry_id, item in zip(entry_ids, items)],
+            )
+            self._db.commit()
+        return entry_ids
+
+    def record_delete(self, outlet, staff, entry_id):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO journal (outlet, staff, op, entry_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (*self.owner(outlet, staff), DELETE, entry_id, time.time()),
+            )
+            self._db.commit()
+
+    def move_entries(self, outlet, staff, entry_ids, items):
+        """
+        Moves open entries to the list of `outlet` and `staff` (e.g. after a
+        typo in the staff name is fixed): in one transaction each entry is
+        closed with a 'delete' and `items` are added again under the new
+        owner. Returns the new entry ids.
+        """
+        new_ids = [uuid.uuid4().hex for _ in items]
+        now = time.time()
+        owner = self.owner(outlet, staff)
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO journal (outlet, staff, op, entry_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(*owner, DELETE, entry_id, now) for entry_id in entry_ids],
+            )
+            self._db.executemany(
+                "INSERT INTO journal (outlet, staff, op, entry_id, item, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*owner, ADD, entry_id, json.dumps(item, default=str), now) for entry_id, item in zip(new_ids, items)],
+            )
+            self._db.commit()
+        return new_ids
+
+    def open_entries(self, outlet, staff):
+        """([entry ids], [items]) still on the list for this outlet and staff, in the order added."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT a.entry_id, a.item FROM journal a"
+                " WHERE a.outlet = ? AND a.staff = ? AND a.op = ?"
+                " AND NOT EXISTS (SELECT 1 FROM journal b WHERE b.entry_id = a.entry_id AND b.op != ?)"
+                " ORDER BY a.id",
+                (*self.owner(outlet, staff), ADD, ADD),
+            ).fetchall()
+        return [entry_id for entry_id, _ in rows], [json.loads(item) for _, item in rows]
+
+    @staticmethod
+    def submission_id(entry_ids):
+        """Submission id for a batch of entries; the same entries always give the same id."""
+        return hashlib.sha1("\n".join(entry_ids).encode()).hexdigest()
+
+    def commit(self, outlet, staff, entry_ids, submission_id):
+        """Marks `entry_ids` as submitted under `submission_id` (one transaction)."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO journal (outlet, staff, op, entry_id, submission_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*self.owner(outlet, staff), COMMIT, entry_id, submission_id, now) for entry_id in entry_ids],
+            )
+            self._db.commit()
@@ -0,0 +1,305 @@
+"""
+Item master helpers shared by the outlet dashboard (variance.py).
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+# Only these columns are used by the app; everything else in the export is dropped.
+ITEM_MASTER_COLUMNS = ["Item Bar Code", "Item Name", "LP Supplier"]
+# Also kept when the export has them (bulk entry takes a missing cost from here)
+OPTIONAL_MASTER_COLUMNS = ["Cost"]
+SNAPSHOT_DIR = ".cache"
+
+# ==========================================
+# BARCODE NORMALIZATION
+# ==========================================
+# Policy:
+# - Values are stringified and stripped. Excel often hands numeric barcodes
+#   back as floats, so a trailing ".0" is dropped ("6291234567890.0").
+# - All-digit codes are GTINs (EAN-8 / UPC-A / EAN-13 / GTIN-14), where
+#   leading zeros carry no meaning: a 12-digit UPC-A "012345678905" and the
+#   same item printed as EAN-13 "0012345678905" must match. Leading zeros are
+#   therefore stripped from all-digit codes ("000" becomes "0").
+# - Anything else (internal codes with letters) is upper-cased and kept as is.
+# - Duplicate barcodes in the master: the FIRST row in file order wins,
+#   which is what the old `match.iloc[0]` scan returned. Later rows are
+#   counted in `BarcodeIndex.duplicates` so they can be cleaned up at source.
+
+def normalize_barcode(value):
+    """Returns the lookup key for a single scanned or stored barcode."""
+    if value is None:
+        return ""
+    code = str(value).strip()
+    if code.endswith(".0") and code[:-2].isdigit():
+        code = code[:-2]
+    if code.isdigit():
+        return code.lstrip("0") or "0"
+    return code.upper()
+
+
+def normalize_barcodes(series):
+    """Vectorized `normalize_barcode` over a whole column."""
+    # Missing cells become "" so they can never match a real scan
+    codes = series.astype(object).where(series.notna(), "").astype(str).str.strip()
+    codes = codes.str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+    digits = codes.str.fullmatch(r"\d+").astype(bool)
+    stripped = codes.str.lstrip("0").replace("", "0")
+    return codes.where(~digits, stripped).where(digits, codes.str.upper())
+
+
+# ==========================================
+# BARCODE INDEX
+# ==========================================
+class BarcodeIndex:
+    """
+    Hash index from normalized barcode to row position in the item master.
+    Built once per load; lookups are a single dict access.
+    """
+
+    def __init__(self, df, column="Item Bar Code"):
+        if df.empty or column not in df.columns:
+            self.keys = pd.Series([], dtype=object)
+            self.positions = {}
+            self.key_index = pd.Index([], dtype=object)
+            self.key_positions = np.array([], dtype=np.int64)
+            self.duplicates = 0
+            return
+
+        self.keys = normalize_barcodes(df[column]).reset_index(drop=True)
+        valid = self.keys[self.keys != ""]
+        first = valid[~valid.duplicated(keep="first")]
+        self.positions = dict(zip(first.values, first.index))
+        # Same mapping as a hash Index, for joining a whole column at once
+        self.key_index = pd.Index(first.values, dtype=object)
+        self.key_positions = first.index.to_numpy(dtype=np.int64)
+        self.duplicates = int(len(valid) - len(first))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def lookup(self, barcode):
+        """Returns the row position for `barcode`, or None if not in the master."""
+        key = normalize_barcode(barcode)
+        if not key:
+            return None
+        return self.positions.get(key)
+
+    def lookup_many(self, barcodes):
+        """Row positions for a Series of barcodes in one vectorized join (-1 where not found)."""
+        found = self.key_index.get_indexer(normalize_barcodes(pd.Series(barcodes, dtype=object)))
+        return np.where(found >= 0, self.key_positions[np.maximum(found, 0)] if len(self.key_positions) else -1, -1)
+
+
+# ==========================================
+# ITEM NAME SEARCH INDEX
+# ==========================================
+# Typeahead over "Item Name" and "LP Supplier" for scans that are not in the
+# master. Both columns are split into upper-cased alphanumeric words. The
+# distinct words are kept sorted, and each word's rows are stored in one
+# posting array ordered by word, so every word that starts with a typed
+# prefix owns one contiguous slice: a prefix costs two binary searches, not
+# a scan. Rows must match every typed word (as a prefix of one of their
+# words). When nothing matches, a trigram index over the vocabulary finds
+# the closest spellings of each typed word instead.
+
+def _words(text):
+    return re.findall(r"[A-Z0-9]+", str(text).upper())
+
+
+def _trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ItemNameIndex:
+    """
+    Word-prefix index (with a trigram fallback for typos) from item name and
+    supplier words to row positions in the item master. Built once per load.
+    """
+
+    def __init__(self, df, name_column="Item Name", supplier_column="LP Supplier"):
+        self.names = df[name_column].astype(str).to_numpy() if name_column in df.columns else np.array([], dtype=object)
+        self.suppliers = (df[supplier_column].astype(str).to_numpy()
+                          if supplier_column in df.columns else np.full(len(self.names), "", dtype=object))
+        text = pd.Series(self.names, dtype=object) + " " + pd.Series(self.suppliers, dtype=object)
+        tokens = text.str.upper().str.findall(r"[A-Z0-9]+").explode().dropna()
+
+        codes, vocab = pd.factorize(tokens, sort=True)
+        rows = tokens.index.to_numpy(dtype=np.int64)
+        order = np.lexsort((rows, codes))
+        self.vocab = np.asarray(vocab, dtype=str)
+        self.postings = rows[order].astype(np.int32)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.vocab)))])
+        # Word code of each name's first word, to rank "starts with" matches first
+        self.first_words = np.full(len(self.names), -1, dtype=np.int64)
+        leading = ~tokens.index.duplicated(keep="first")
+        self.first_words[rows[leading]] = codes[leading]
+        # Shorter names rank first among equally good matches
+        self.name_lengths = np.fromiter((len(n) for n in self.names), dtype=np.int32, count=len(self.names))
+        self._trigram_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_codes(self, prefix):
+        """[lo, hi) range of vocabulary codes of the words starting with `prefix`."""
+        lo = np.searchsorted(self.vocab, prefix, side="left")
+        hi = np.searchsorted(self.vocab, prefix + "\uffff", side="left")
+        return lo, hi
+
+    def _prefix_mask(self, prefix):
+        """Boolean mask of the rows having a word that starts with `prefix`."""
+        lo, hi = self._prefix_codes(prefix)
+        mask = np.zeros(len(self.names), dtype=bool)
+        mask[self.postings[self.offsets[lo]:self.offsets[hi]]] = True
+        return mask
+
+    def _word_rows(self, code):
+        return self.postings[self.offsets[code]:self.offsets[code + 1]]
+
+    def _similar_words(self, word, limit=20, min_score=0.5):
+        """Vocabulary codes sharing the most trigrams with `word` (built on first use)."""
+        if self._trigram_index is None:
+            grams = {}
+            for code, vocab_word in enumerate(self.vocab):
+                for gram in _trigrams(vocab_word):
+                    grams.setdefault(gram, []).append(code)
+            self._trigram_index = {g: np.array(c, dtype=np.int32) for g, c in grams.items()}
+        query = _trigrams(word)
+        hits = [self._trigram_index[g] for g in query if g in self._trigram_index]
+        if not hits:
+            return np.array([], dtype=np.int64)
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.vocab))
+        best = np.flatnonzero(counts >= max(1, min_score * len(query)))
+        return best[np.argsort(-counts[best], kind="stable")[:limit]]
+
+    def search(self, query, limit=10):
+        """Row positions of the best matches for `query`, best first (at most `limit`)."""
+        words = _words(query)
+        if not words or not len(self.vocab):
+            return []
+
+        # Each word costs O(rows matching it); the masks are ANDed together
+        mask = np.ones(len(self.names), dtype=bool)
+        for word in words:
+            mask &= self._prefix_mask(word)
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            # No exact prefix match: rank rows by how many typed words they match approximately
+            counts = np.zeros(len(self.names), dtype=np.int16)
+            for word in words:
+                word_mask = np.zeros(len(self.names), dtype=bool)
+                for code in self._similar_words(word):
+                    word_mask[self._word_rows(code)] = True
+                counts += word_mask
+            rows = np.flatnonzero(counts)
+            rank = np.lexsort((rows, self.name_lengths[rows], -counts[rows]))
+        else:
+            # Names that start with the first typed word, then shorter names
+            lo, hi = self._prefix_codes(words[0])
+            first_words = self.first_words[rows]
+            starts = (first_words >= lo) & (first_words < hi)
+            rank = np.lexsort((rows, self.name_lengths[rows], ~starts))
+        return rows[rank[:limit]].tolist()
+
+
+# ==========================================
+# COLUMNAR SNAPSHOT OF THE EXCEL EXPORT
+# ==========================================
+# Parsing the workbook with openpyxl takes tens of seconds, so the first load
+# writes a Feather snapshot of the used columns next to a small JSON sidecar
+# recording the source file's mtime, size and SHA-256 and the column list.
+# Later loads read the snapshot (memory-mapped) unless the source or the
+# column list has changed:
+# - mtime and size unchanged -> snapshot is trusted without hashing
+# - mtime changed but hash unchanged (file copied/touched) -> sidecar refreshed
+# - hash changed -> workbook is re-read and the snapshot rebuilt
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(file_path, snapshot_dir):
+    base = os.path.join(snapshot_dir, os.path.splitext(os.path.basename(file_path))[0])
+    return base + ".feather", base + ".json"
+
+
+def read_item_excel(file_path):
+    """Reads only the used columns from the workbook, as clean strings."""
+    df = pd.read_excel(
+        file_path,
+        usecols=lambda c: str(c).strip() in ITEM_MASTER_COLUMNS + OPTIONAL_MASTER_COLUMNS,
+        dtype=object,
+    )
+    df.columns = df.columns.str.strip()
+    for col in df.columns:
+        df[col] = df[col].where(df[col].notna(), "").astype(str).str.strip()
+    return df
+
+
+def _snapshot_is_fresh(meta, stat, file_path):
+    if meta.get("columns") != ITEM_MASTER_COLUMNS + OPTIONAL_MASTER_COLUMNS:
+        return False
+    if meta.get("size") != stat.st_size:
+        return False
+    if meta.get("mtime") == stat.st_mtime:
+        return True
+    return meta.get("sha256") == _file_sha256(file_path)
+
+
+def load_item_master(file_path, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the item master, preferring the columnar snapshot and falling back
+    to the workbook when the snapshot is missing or stale.
+    Raises FileNotFoundError if the workbook does not exist.
+    """
+    stat = os.stat(file_path)
+    snapshot_path, meta_path = _snapshot_paths(file_path, snapshot_dir)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if _snapshot_is_fresh(meta, stat, file_path):
+            df = feather.read_table(snapshot_path, memory_map=True).to_pandas()
+            if meta.get("mtime") != stat.st_mtime:
+                meta["mtime"] = stat.st_mtime
+                with open(meta_path, "w") as f:
+                    json.dump(meta, f)
+            return df
+    except (OSError, ValueError):
+        pass  # No usable snapshot yet; rebuild below
+
+    df = read_item_excel(file_path)
+    if all(col in df.columns for col in ITEM_MASTER_COLUMNS):
+        try:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            df.reset_index(drop=True).to_feather(snapshot_path)
+            with open(meta_path, "w") as f:
+                json.dump({
+                    "source": os.path.abspath(file_path),
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha256": _file_sha256(file_path),
+                    "columns": ITEM_MASTER_COLUMNS + OPTIONAL_MASTER_COLUMNS,
+                }, f)
+        except OSError:
+            pass  # Read-only deployments still work, just without the cache
+    return df
+
+
+if __name__ == "__main__":
+    # Pre-build the snapshot at deploy time: python item_master.py "<workbook>.xlsx"
+    import sys
+
+    for path in sys.argv[1:]:
+        print(f"{path}: {len(load_item_master(path)):,} items snapshotted to {SNAPSHOT_DIR}/")
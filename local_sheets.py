@@ -0,0 +1,217 @@
+"""
+Offline stand-in for the Google Sheets backend.
+
+LocalSheetsBackend stores worksheets in a SQLite file and answers the same
+Worksheet calls both apps make (get_all_values, row_values, append_row,
+append_rows, batch_update, batch_get), returning values the way the Sheets
+API does: strings, trailing blank cells and rows trimmed. Artificial
+latency and 429 quota errors can be switched on to load-test the apps
+without network access or real quotas.
+
+Selected with SHEETS_BACKEND=local (see sheets.py).
+"""
+import collections
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+READ_METHODS = {"get_all_values", "row_values", "batch_get"}
+
+
+def _cell_text(value):
+    """Mirrors how Sheets echoes RAW-written values back as formatted strings."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(rows):
+    """Drops trailing blank cells in each row and trailing blank rows, like the API."""
+    trimmed = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+def quota_error(message="Quota exceeded for quota metric 'Read requests' (emulated)."):
+    """Builds the same APIError gspread raises for HTTP 429."""
+    response = requests.Response()
+    response.status_code = 429
+    response._content = json.dumps({
+        "error": {"code": 429, "message": message, "status": "RESOURCE_EXHAUSTED"}
+    }).encode()
+    return APIError(response)
+
+
+class LocalSheetsBackend:
+    """
+    SQLite-backed spreadsheet.
+
+    - latency: seconds slept before every call (simulates the network round trip)
+    - error_rate: probability (0-1) that a call fails with an emulated 429
+    - reads_per_minute / writes_per_minute: sliding-window quotas; a call over
+      the limit fails with a 429, as the real API does (None = unlimited)
+    """
+
+    def __init__(self, path="local_sheets.db", latency=0.0, error_rate=0.0,
+                 reads_per_minute=None, writes_per_minute=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quotas = {"read": reads_per_minute, "write": writes_per_minute}
+        self._calls = {"read": collections.deque(), "write": collections.deque()}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Both apps may open the same file; WAL lets readers and the writer overlap
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " sheet TEXT NOT NULL, row_num INTEGER NOT NULL, cells TEXT NOT NULL,"
+            " PRIMARY KEY (sheet, row_num))"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Backend configured by SHEETS_LOCAL_* environment variables."""
+        def number(name, cast=float):
+            value = os.environ.get(name)
+            return cast(value) if value not in (None, "") else None
+
+        return cls(
+            path=os.environ.get("SHEETS_LOCAL_PATH", "local_sheets.db"),
+            latency=number("SHEETS_LOCAL_LATENCY") or 0.0,
+            error_rate=number("SHEETS_LOCAL_ERROR_RATE") or 0.0,
+            reads_per_minute=number("SHEETS_LOCAL_READS_PER_MINUTE", int),
+            writes_per_minute=number("SHEETS_LOCAL_WRITES_PER_MINUTE", int),
+        )
+
+    def worksheet(self, name):
+        return LocalWorksheet(self, name)
+
+    # --- Call accounting (latency and quota emulation) ---
+    def _charge(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        kind = "read" if method in READ_METHODS else "write"
+        with self._lock:
+            limit = self.quotas[kind]
+            window = self._calls[kind]
+            now = time.monotonic()
+            while window and now - window[0] > 60:
+                window.popleft()
+            if limit is not None and len(window) >= limit:
+                raise quota_error(f"Quota exceeded for quota metric '{kind} requests' (emulated).")
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise quota_error()
+            window.append(now)
+
+    # --- Row storage ---
+    def _rows(self, sheet, first=1, last=None):
+        """Dense list of rows `first`..`last` (1-based, inclusive); blank rows as []."""
+        cursor = self._db.execute(
+            "SELECT row_num, cells FROM rows WHERE sheet = ? AND row_num >= ? AND row_num <= ? ORDER BY row_num",
+            (sheet, first, last if last is not None else 2**62),
+        )
+        rows = []
+        for row_num, cells in cursor:
+            rows.extend([] for _ in range(row_num - first - len(rows)))
+            rows.append(json.loads(cells))
+        return rows
+
+    def _last_row(self, sheet):
+        cursor = self._db.execute("SELECT MAX(row_num) FROM rows WHERE sheet = ? AND cells != '[]'", (sheet,))
+        return cursor.fetchone()[0] or 0
+
+    def _write_row(self, sheet, row_num, cells):
+        self._db.execute(
+            "INSERT OR REPLACE INTO rows (sheet, row_num, cells) VALUES (?, ?, ?)",
+            (sheet, row_num, json.dumps(cells)),
+        )
+
+
+class LocalWorksheet:
+    """Worksheet handle with the gspread method signatures the apps rely on."""
+
+    def __init__(self, backend, title):
+        self._backend = backend
+        self.title = title
+
+    def get_all_values(self):
+        self._backend._charge("get_all_values")
+        with self._backend._lock:
+            rows = _trim(self._backend._rows(self.title))
+        width = max((len(r) for r in rows), default=0)
+        return [r + [""] * (width - len(r)) for r in rows]
+
+    def row_values(self, row):
+        self._backend._charge("row_values")
+        with self._backend._lock:
+            rows = _trim(self._backend._rows(self.title, row, row))
+        return rows[0] if rows else []
+
+    def batch_get(self, ranges, **kwargs):
+        self._backend._charge("batch_get")
+        results = []
+        with self._backend._lock:
+            for a1 in ranges:
+                grid = a1_range_to_grid_range(a1)
+                first = grid.get("startRowIndex", 0) + 1
+                last = grid.get("endRowIndex")
+                c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+                rows = self._backend._rows(self.title, first, last)
+                results.append(_trim([row[c0:c1] for row in rows]))
+        return results
+
+    def append_row(self, values, **kwargs):
+        return self._append([values], "append_row")
+
+    def append_rows(self, values, **kwargs):
+        return self._append(values, "append_rows")
+
+    def _append(self, values, method):
+        self._backend._charge(method)
+        with self._backend._lock:
+            # Like the API, append after the last row that has any content
+            start = self._backend._last_row(self.title) + 1
+            for offset, row in enumerate(values):
+                self._backend._write_row(self.title, start + offset, [_cell_text(v) for v in row])
+            self._backend._db.commit()
+        last = start + len(values) - 1
+        width = max((len(r) for r in values), default=1)
+        return {"updates": {
+            "updatedRange": f"{self.title}!A{start}:{rowcol_to_a1(last, width)}",
+            "updatedRows": len(values),
+        }}
+
+    def batch_update(self, data, **kwargs):
+        self._backend._charge("batch_update")
+        with self._backend._lock:
+            for update in data:
+                grid = a1_range_to_grid_range(update["range"])
+                first, c0 = grid.get("startRowIndex", 0) + 1, grid.get("startColumnIndex", 0)
+                rows = self._backend._rows(self.title, first, first + len(update["values"]) - 1)
+                for i, values in enumerate(update["values"]):
+                    row = rows[i] if i < len(rows) else []
+                    for j, value in enumerate(values):
+                        row.extend([""] * (c0 + j + 1 - len(row)))
+                        row[c0 + j] = _cell_text(value)
+                    self._backend._write_row(self.title, first + i, row)
+            self._backend._db.commit()
+        return {"totalUpdatedCells": sum(len(v) for u in data for v in u["values"])}
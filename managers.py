@@ -1,8 +1,16 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 import gspread
 import time
+from local_sheets import LocalSheetsBackend
+from sheets import SHEETS_BACKEND, ScheduledBackend, ScheduledWorksheet, SheetsConnection
+from feedback_data import LOW_RATING, RATINGS, FeedbackSheetSync
+from action_data import (
+    PAGE_SIZES, ROLLUP_DIMENSIONS, ItemsSheetSync, ItemsSnapshot, build_filter_mask, check_action_conflicts,
+    coalesce_cell_updates,
+    matching_positions, overlay_changes, page_frame, pending_action_edits, resolve_overlay,
+    stage_action_edits,
+)
 
 # --- Configuration ---
 # NOTE: In a real environment, __gspread_credentials will be provided by the hosting service.
@@ -12,38 +20,54 @@ import time
 # ⚠️ ACTION REQUIRED: Replace the placeholder URL below with the actual URL of your Google Sheet.
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1MK5WDETIFCRes-c8X16JjrNdrlEpHwv9vHvb96VVtM0/edit?gid=0#gid=0" 
 ITEMS_WORKSHEET_NAME = "Items"           # The sheet containing the submitted data
+FEEDBACK_WORKSHEET_NAME = "Feedback"     # Customer ratings written by the outlet app
 
 # --- Session State Initialization (Minimal) ---
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
-if 'df_gsheet' not in st.session_state:
-    st.session_state.df_gsheet = pd.DataFrame()
-if 'df_edited' not in st.session_state:
-    st.session_state.df_edited = pd.DataFrame()
+if 'snapshot' not in st.session_state:
+    st.session_state.snapshot = ItemsSnapshot.empty() # Shared, read-only; never copied per session
+if 'action_overlay' not in st.session_state:
+    st.session_state.action_overlay = {} # This session's unsaved 'Action Took' values by sheet row
+if 'save_conflicts' not in st.session_state:
+    st.session_state.save_conflicts = None # Edits the last save refused to overwrite
+if 'editor_version' not in st.session_state:
+    st.session_state.editor_version = 0
+if 'rollup_version' not in st.session_state:
+    st.session_state.rollup_version = 0 # Bumped to clear the loss summary drill-down
 
 # --- Google Sheets Connection ---
+def service_account_info():
+    """Service account credentials from the hosting service, else from st.secrets (None if neither)."""
+    # Check for provided credentials (used by Streamlit Cloud)
+    if '__gspread_credentials' in globals():
+        return globals()['__gspread_credentials']
+    # Fallback for local testing (requires st.secrets or local creds file)
+    if "gcp_service_account" not in st.secrets:
+        return None
+    return st.secrets["gcp_service_account"]
 
 @st.cache_resource(show_spinner="Connecting to Google Sheets...")
 def get_gspread_client():
     """Initializes and returns the gspread client using credentials, using the URL."""
+    # SHEETS_BACKEND=local swaps in the offline SQLite emulator (local_sheets.py)
+    if SHEETS_BACKEND == "local":
+        return ScheduledWorksheet(LocalSheetsBackend.from_env().worksheet(ITEMS_WORKSHEET_NAME))
+
     try:
-        # Check for provided credentials (used by Streamlit Cloud)
-        if '__gspread_credentials' in globals():
-            creds = globals()['__gspread_credentials']
-        else:
-            # Fallback for local testing (requires st.secrets or local creds file)
-            if "gcp_service_account" not in st.secrets:
-                 st.error("Google Sheets credentials not found. Please ensure 'gcp_service_account' is set in st.secrets.")
-                 return None
-            creds = st.secrets["gcp_service_account"]
+        creds = service_account_info()
+        if creds is None:
+            st.error("Google Sheets credentials not found. Please ensure 'gcp_service_account' is set in st.secrets.")
+            return None
 
         gc = gspread.service_account_from_dict(creds)
         # === CRITICAL CHANGE: open_by_url instead of open ===
         spreadsheet = gc.open_by_url(SPREADSHEET_URL)
         items_worksheet = spreadsheet.worksheet(ITEMS_WORKSHEET_NAME)
-        return items_worksheet
+        # Rate limit and retry every call with backoff (sheets.RequestScheduler)
+        return ScheduledWorksheet(items_worksheet)
     except gspread.exceptions.SpreadsheetNotFound:
         st.error(f"Spreadsheet at URL not found or access denied.")
         return None
@@ -58,107 +82,105 @@ items_worksheet = get_gspread_client()
 sheets_connected = items_worksheet is not None
 
 
+@st.cache_resource(show_spinner=False)
+def get_sheets_connection():
+    """
+    Shared, lazily opened connection (sheets.py) for the worksheets besides
+    Items; nothing is fetched until a worksheet is first used. Raises on bad
+    credentials, and a raised error is not cached, so the next rerun tries again.
+    """
+    if SHEETS_BACKEND == "local":
+        return ScheduledBackend(LocalSheetsBackend.from_env())
+    return ScheduledBackend(SheetsConnection(service_account_info(), SPREADSHEET_URL))
+
+
 # --- Data Loading Function (Fetches all data and row numbers) ---
-@st.cache_data(ttl=60) # Cache for 1 minute
-def load_action_data(worksheet):
+@st.cache_resource
+def get_items_sync(_worksheet):
+    """One incremental mirror of the Items sheet shared by all sessions."""
+    return ItemsSheetSync(_worksheet)
+
+@st.cache_resource(ttl=60) # Shared by all sessions; refreshed at most once a minute
+def load_action_data(_worksheet):
     """
-    Fetches all data, including row indices, for tracking changes.
-    Returns a DataFrame and the list of column headers.
+    Returns the current ItemsSnapshot of the Items sheet (data with row
+    indices, headers and a version number). Every session gets the same
+    object, so the sheet is held once per process, not once per session.
+    After the first load only appended rows and the 'Action Took' column
+    are downloaded (see action_data.ItemsSheetSync).
     """
     if not sheets_connected:
-        return pd.DataFrame(), []
+        return ItemsSnapshot.empty()
 
     try:
-        data = worksheet.get_all_values()
-        if not data:
-            return pd.DataFrame(), []
+        return get_items_sync(_worksheet).refresh()
 
-        headers = data[0]
-        records = data[1:]
+    except Exception as e:
+        st.error(f"❌ Error loading dashboard data from Google Sheets: {e}")
+        return ItemsSnapshot.empty()
 
-        df = pd.DataFrame(records, columns=headers)
-        
-        # Add a temporary 'GSHEET_ROW_INDEX' column (1-based index)
-        df['GSHEET_ROW_INDEX'] = range(2, len(df) + 2)
+@st.cache_resource
+def get_feedback_sync(_worksheet):
+    """One append-only mirror of the Feedback sheet shared by all sessions."""
+    return FeedbackSheetSync(_worksheet)
 
-        # Convert numeric columns safely
-        for col in ['Qty', 'Cost', 'Selling', 'Amount', 'GP%', 'CF']:
-             if col in df.columns:
-                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) 
-        
-        # Ensure date columns are in a reasonable format
-        if 'Date Submitted' in df.columns:
-            df['Date Submitted'] = pd.to_datetime(df['Date Submitted'], errors='coerce')
-        # === CRITICAL CHANGE: Ensure Expiry is parsed as datetime for filtering ===
-        if 'Expiry' in df.columns: 
-            df['Expiry'] = pd.to_datetime(df['Expiry'], errors='coerce')
-        
-        # Ensure 'Action Took' column exists for filtering, defaulting to a blank string
-        if 'Action Took' not in df.columns:
-            df['Action Took'] = ''
-            
-        return df, headers
+@st.cache_resource(ttl=60)
+def load_feedback_data(_worksheet):
+    """
+    Current FeedbackSnapshot (ratings, per-outlet/per-day rollup and the
+    low-rating index). Only rows appended since the last load are fetched.
+    Errors propagate, so a failed load is reported and not cached.
+    """
+    return get_feedback_sync(_worksheet).refresh()
 
-    except Exception as e:
-        st.error(f"❌ Error loading dashboard data from Google Sheets: {e}")
-        return pd.DataFrame(), []
+def has_editor_edits():
+    """True if an editor on screen holds edits not yet staged in the session overlay."""
+    return any(
+        key.startswith("action_editor_") and (st.session_state[key] or {}).get("edited_rows")
+        for key in list(st.session_state.keys())
+    )
 
 # --- Data Submission Function (Writes back to GSheet) ---
-def save_edited_data(df_original, df_edited, worksheet):
+def save_edited_data(snapshot, overlay, worksheet):
     """
-    Compares the original and edited DataFrames and writes only the 
-    modified 'Action Took' cells back to Google Sheets.
+    Writes this session's overlay of 'Action Took' edits back to Google
+    Sheets, skipping cells that already hold the new value.
+    The target cells are read back first: edits whose row moved or whose
+    value was changed by someone else since the snapshot are not written
+    but reported as conflicts.
     """
-    if df_original.empty or df_edited.empty:
+    if snapshot.df.empty:
         st.warning("No data to save.")
         return
 
-    if 'GSHEET_ROW_INDEX' not in df_edited.columns:
-        st.error("Cannot save: Missing row index.")
+    # Find the column index for 'Action Took' (1-based index for gspread)
+    if 'Action Took' not in snapshot.headers:
+        st.error("The column 'Action Took' was not found in the sheet headers.")
         return
-        
-    changes_made = 0
-    updates = []
-    
-    # Iterate through the edited DataFrame to find changes in 'Action Took'
-    for index, row_edited in df_edited.iterrows():
-        # Find the original row using the unique GSHEET_ROW_INDEX
-        original_row_match = df_original[df_original['GSHEET_ROW_INDEX'] == row_edited['GSHEET_ROW_INDEX']]
-        if original_row_match.empty:
-            continue
-            
-        original_row = original_row_match.iloc[0]
+    action_col_index = snapshot.headers.index('Action Took') + 1
 
-        # Check if Action Took has changed
-        if 'Action Took' in df_edited.columns and str(row_edited['Action Took']) != str(original_row['Action Took']):
-            
-            gsheet_row = int(row_edited['GSHEET_ROW_INDEX'])
-            new_action = str(row_edited['Action Took'])
-            
-            # Find the column index for 'Action Took' (1-based index for gspread)
-            try:
-                action_col_index = df_original.columns.get_loc('Action Took') + 1
-            except KeyError:
-                st.error("The column 'Action Took' was not found in the sheet headers.")
-                return 
-
-            # Create the update object: [row, col, value]
-            updates.append({
-                'range': gspread.utils.rowcol_to_a1(gsheet_row, action_col_index),
-                'values': [[new_action]]
-            })
-            changes_made += 1
+    # Only overlay rows are compared; adjacent rows share one range
+    changes = overlay_changes(snapshot, overlay)
+    with st.spinner(f"Checking {len(changes)} changes against the sheet..."):
+        changes, conflicts = check_action_conflicts(worksheet, snapshot, changes)
+    changes_made = len(changes)
+    updates = coalesce_cell_updates(changes, action_col_index)
 
     if changes_made > 0:
         with st.spinner(f"Saving {changes_made} changes..."):
             worksheet.batch_update(updates)
         st.success(f"✅ Successfully updated {changes_made} records in Google Sheets!")
-        st.session_state.df_gsheet = df_edited.copy()
-        load_action_data.clear() 
-    else:
+    elif conflicts.empty:
         st.info("No changes detected in the 'Action Took' column to save.")
-        
-    st.session_state.df_edited = st.session_state.df_gsheet.copy()
+
+    if (conflicts['Reason'] != 'Changed by someone else').any():
+        # Rows were inserted or deleted: row numbers are stale, so download again
+        get_items_sync(worksheet).invalidate()
+    st.session_state.save_conflicts = conflicts if not conflicts.empty else None
+    load_action_data.clear() # Next load publishes a snapshot with the current values
+
+    st.session_state.action_overlay = {}
+    st.session_state.data_loaded = False
     st.rerun()
 
 
@@ -194,23 +216,100 @@ elif sheets_connected:
     
     # Load or Refresh Data
     if st.button("🔄 Reload Data from Google Sheet"):
+        # Download the whole sheet again, in case rows were inserted or deleted
+        get_items_sync(items_worksheet).invalidate()
         load_action_data.clear()
+        load_feedback_data.clear()
         st.session_state.data_loaded = False
         st.rerun()
 
     if not st.session_state.data_loaded:
-        df_gsheet, headers = load_action_data(items_worksheet)
-        st.session_state.df_gsheet = df_gsheet
-        st.session_state.df_edited = df_gsheet.copy() # Initialize edited state
+        # Sessions hold a reference to the shared snapshot, never a copy
+        st.session_state.snapshot = load_action_data(items_worksheet)
+        st.session_state.action_overlay = {}
         st.session_state.data_loaded = True
-    
-    df_display = st.session_state.df_edited.copy()
+    elif not st.session_state.action_overlay and not has_editor_edits():
+        # Nothing unsaved refers to the old snapshot: move to the newest one, so
+        # idle sessions do not each keep an outdated copy of the sheet alive
+        latest = get_items_sync(items_worksheet).snapshot
+        if latest.version > st.session_state.snapshot.version:
+            st.session_state.snapshot = latest
+
+    snapshot = st.session_state.snapshot
+    df_display = snapshot.df # Read-only: edits live in the session overlay
+
+    if snapshot.parse_failures:
+        failed = ", ".join(f"{col}: {n}" for col, n in snapshot.parse_failures.items())
+        st.caption(f"⚠️ Some cells could not be read and are shown blank or as 0 ({failed}).")
+
+    if st.session_state.save_conflicts is not None:
+        conflicts = st.session_state.save_conflicts
+        st.warning(
+            f"⚠️ {len(conflicts)} change(s) were not saved because the sheet changed since it was loaded. "
+            "The table now shows the current values; re-apply your edits if they still hold."
+        )
+        st.dataframe(conflicts, hide_index=True, use_container_width=True)
+        if st.button("Dismiss", key="dismiss_conflicts"):
+            st.session_state.save_conflicts = None
+            st.rerun()
+    overlay = resolve_overlay(snapshot, st.session_state.action_overlay)
+
+    # --- Customer feedback: ratings rolled up per outlet and day as they arrive ---
+    try:
+        feedback = load_feedback_data(get_sheets_connection().worksheet(FEEDBACK_WORKSHEET_NAME))
+    except Exception as e:
+        st.error(f"❌ Error loading feedback from Google Sheets: {e}")
+        feedback = None
+    if feedback is not None:
+        with st.expander(f"⭐ Customer Feedback ({len(feedback.df)} responses)"):
+            col_period, col_outlet = st.columns(2)
+            with col_period:
+                period_options = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90, "All Time": None}
+                period = st.selectbox("Period", list(period_options), index=1, key="feedback_period")
+            with col_outlet:
+                feedback_outlets = sorted(feedback.rollup.by_outlet()["Outlet"].tolist())
+                outlet_selection = st.selectbox("Outlet", ["-- All Outlets --"] + feedback_outlets, key="feedback_outlet")
+
+            days = period_options[period]
+            since = (pd.Timestamp.now().normalize() - pd.Timedelta(days=days - 1)).date() if days else None
+            feedback_outlet = None if outlet_selection == "-- All Outlets --" else outlet_selection
+            star_labels = {r: f"{r}★" for r in RATINGS}
+
+            per_outlet = feedback.rollup.by_outlet(start=since)
+            if feedback_outlet is not None:
+                per_outlet = per_outlet[per_outlet["Outlet"] == feedback_outlet]
+            st.dataframe(
+                per_outlet.rename(columns=star_labels),
+                column_config={"Average": st.column_config.NumberColumn("Average", format="%.2f")},
+                hide_index=True,
+                use_container_width=True,
+            )
+
+            per_day = feedback.rollup.by_day(outlet=feedback_outlet, start=since)
+            if not per_day.empty:
+                st.caption("Average rating per day")
+                st.line_chart(per_day.set_index("DAY")["Average"], height=200)
+
+            low = feedback.low_ratings(outlet=feedback_outlet, start=since)
+            st.markdown(f"**Low ratings (1–{LOW_RATING} stars): {len(low)}**")
+            if not low.empty:
+                complaint_cols = [c for c in ["Submitted At", "Outlet", "Rating", "Customer Name", "Mobile Number", "Feedback"]
+                                  if c in low.columns]
+                st.dataframe(
+                    low[complaint_cols].head(200), # Latest submissions first
+                    column_config={"Submitted At": st.column_config.DatetimeColumn("Submitted At", format="DD MMM YY HH:mm")},
+                    hide_index=True,
+                    use_container_width=True,
+                )
 
     if df_display.empty:
         st.warning("No item submission data found in the 'Items' worksheet.")
     else:
-        # Initialize filtered_df with the full data
-        df_filtered = df_display.copy()
+        # Filter selections are collected first and applied as one combined mask
+        date_range = None
+        expiry_days = None
+        form_type_filter = None
+        action_status_filter = None
         
         # --- NEW: FILTER CONTAINER ---
         st.markdown("### 🔍 Data Filters")
@@ -218,16 +317,11 @@ elif sheets_connected:
         # 1. Date Range Filter
         col_date_start, col_date_end, col_dummy = st.columns(3)
         
-        if 'Date Submitted' in df_filtered.columns and not df_filtered['Date Submitted'].dropna().empty:
+        # Min/max submitted dates come straight from the ends of the sorted index
+        date_bounds = snapshot.date_index.bounds('Date Submitted')
+        if date_bounds is not None:
             
-            # Use only date part for min/max calculation
-            df_dates = df_filtered['Date Submitted'].dropna().dt.date
-            min_date = df_dates.min()
-            max_date = df_dates.max()
-            
-            # Ensure min_date is before max_date, or use today as a fallback
-            if min_date > max_date:
-                 min_date = max_date 
+            min_date, max_date = date_bounds
 
             with col_date_start:
                 start_date = st.date_input("Start Date (Submitted)", value=min_date, min_value=min_date, max_value=max_date, key='start_date')
@@ -236,10 +330,7 @@ elif sheets_connected:
 
             if start_date and end_date:
                 # Filter by submitted date range
-                df_filtered = df_filtered[
-                    (df_filtered['Date Submitted'].dt.date >= start_date) & 
-                    (df_filtered['Date Submitted'].dt.date <= end_date)
-                ]
+                date_range = (start_date, end_date)
             
         # 2. Expiry, Submission Type, and Action Status Filters
         col_exp, col_form, col_action = st.columns(3)
@@ -262,23 +353,12 @@ elif sheets_connected:
             
             days_until_expiry = expiry_options[expiry_filter_selection]
             
-            if days_until_expiry != 99999 and 'Expiry' in df_filtered.columns:
-                today = pd.to_datetime(datetime.now().date())
-                
-                if days_until_expiry == 0: # Already Expired
-                    df_filtered = df_filtered[df_filtered['Expiry'].notna() & (df_filtered['Expiry'] < today)]
-                else:
-                    future_date = today + pd.Timedelta(days=days_until_expiry)
-                    # Filter items expiring between today and future_date (inclusive)
-                    df_filtered = df_filtered[
-                        df_filtered['Expiry'].notna() & 
-                        (df_filtered['Expiry'] >= today) & 
-                        (df_filtered['Expiry'] <= future_date)
-                    ]
+            if days_until_expiry != 99999:
+                expiry_days = days_until_expiry
 
         # 2b. Form Type Filter (Near Expiry / Damages / Expiry)
         with col_form:
-            form_types = df_display['Form Type'].dropna().unique().tolist()
+            form_types = snapshot.facets.get('Form Type', [])
             form_type_selection = st.selectbox(
                 "Filter by Submission Type",
                 options=["-- All Submission Types --"] + form_types,
@@ -287,12 +367,16 @@ elif sheets_connected:
             )
 
             if form_type_selection != "-- All Submission Types --":
-                df_filtered = df_filtered[df_filtered['Form Type'] == form_type_selection]
+                form_type_filter = form_type_selection
 
 
         # 2c. Action Took Status Filter
         with col_action:
-            action_took_statuses = df_display['Action Took'].dropna().unique().tolist()
+            action_took_statuses = snapshot.facets.get('Action Took', [])
+            # Statuses typed into this session's unsaved edits are filterable too
+            action_took_statuses = action_took_statuses + sorted(
+                set(overlay.tolist()) - set(action_took_statuses) - {''}
+            )
             filter_action_status = st.selectbox(
                 "Filter by Action Took Status",
                 options=["-- All Action Statuses --"] + action_took_statuses,
@@ -301,12 +385,95 @@ elif sheets_connected:
             )
 
             if filter_action_status != "-- All Action Statuses --":
-                df_filtered = df_filtered[df_filtered['Action Took'] == filter_action_status]
+                action_status_filter = filter_action_status
             
         st.markdown("---") # End of filter container
+
+        # --- Loss summary: totals come from the snapshot's pre-aggregated rollup ---
+        drill = None
+        with st.expander("📊 Loss Summary (value lost by outlet, type, supplier and week)"):
+            col_by, col_clear = st.columns([3, 1])
+            with col_by:
+                rollup_by = st.selectbox("Group by", ROLLUP_DIMENSIONS, key="rollup_by")
+            with col_clear:
+                if st.button("Clear drill-down", key="clear_drill"):
+                    st.session_state.rollup_version += 1
+
+            # Whole weeks overlapping the submitted date range
+            summary = snapshot.rollup.summary(rollup_by, *(date_range or (None, None)))
+            summary_key = f"rollup_{rollup_by}_{hash(date_range) & 0xFFFFFFFF:x}_{st.session_state.rollup_version}"
+            selected = st.dataframe(
+                summary,
+                column_config={
+                    "Week": st.column_config.DateColumn("Week of", format="DD MMM YY"),
+                    "Amount": st.column_config.NumberColumn("Amount", format="%.2f"),
+                    "Cost": st.column_config.NumberColumn("Cost", format="%.2f"),
+                },
+                hide_index=True,
+                use_container_width=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=summary_key,
+            )
+            st.caption("Select a row to show only its submissions in the table below.")
+            if selected.selection.rows:
+                drill = (rollup_by, summary[rollup_by].iloc[selected.selection.rows[0]])
+
+        # Define the visible columns in order (Added Expiry)
+        visible_cols = [
+            "Date Submitted", "Expiry", "Outlet", "Item Name", "Barcode", "Qty", "Unit", 
+            "Action Took", "Staff Name", "Supplier", "Remarks", "Cost", "Selling", "GP%", "Form Type"
+        ]
+        # Sheets written only by the outlet app have no 'Unit' column
+        visible_cols = [col for col in visible_cols if col in df_display.columns]
+
+        # One pass over the base frame; only the final visible slice is materialized
+        filter_mask = build_filter_mask(
+            df_display,
+            date_range=date_range,
+            expiry_days=expiry_days,
+            form_type=form_type_filter,
+            action_status=action_status_filter,
+            date_index=snapshot.date_index,
+            overlay=overlay,
+            drill=drill,
+        )
+
+        # 3. Search, sort and paging: only the current page is sent to the editor
+        col_search, col_sort, col_desc, col_size, col_page = st.columns([3, 2, 1, 1, 1])
+        with col_search:
+            search_text = st.text_input("Search (item, barcode, supplier, staff, outlet, remarks)", key="table_search")
+        with col_sort:
+            sort_selection = st.selectbox("Sort by", ["Sheet order"] + visible_cols, key="table_sort")
+        with col_desc:
+            sort_desc = st.checkbox("Descending", key="table_sort_desc")
+        with col_size:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="table_page_size")
+
+        positions = matching_positions(df_display, filter_mask, search_text)
+        total_pages = max(1, -(-len(positions) // page_size))
+        # Narrower filters can leave the stored page past the end
+        if st.session_state.get("table_page", 1) > total_pages:
+            st.session_state.table_page = total_pages
+        with col_page:
+            page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="table_page")
+
+        sort_by = None if sort_selection == "Sheet order" else sort_selection
+        df_page = page_frame(
+            df_display, positions, visible_cols + ['GSHEET_ROW_INDEX'], # Include index for saving
+            sort_by=sort_by, descending=sort_desc, page=page, page_size=page_size, overlay=overlay,
+        )
         
         # Update subheader with filtered count
-        st.subheader(f"Filtered Results ({len(df_filtered)} Records)")
+        st.subheader(f"Filtered Results ({len(positions)} Records)")
+        if drill is not None:
+            drill_by, drill_value = drill
+            if drill_by == "Week":
+                drill_value = "(no date)" if pd.isna(drill_value) else f"week of {drill_value:%d %b %y}"
+            st.caption(f"Drilled down to {drill_by}: {drill_value or '(blank)'} from the Loss Summary.")
+        if len(positions):
+            first_shown = (page - 1) * page_size + 1
+            st.caption(f"Showing rows {first_shown}–{first_shown + len(df_page) - 1} (page {page} of {total_pages})")
 
         # Define which columns are visible and how they behave
         column_config = {
@@ -332,48 +499,50 @@ elif sheets_connected:
             ),
             
             # Hide the internal row index
-            "GSHEET_ROW_INDEX": st.column_config.TextColumn(disabled=True, is_table_index=True, width="tiny"), 
+            "GSHEET_ROW_INDEX": None, 
         }
         
-        # Define the visible columns in order (Added Expiry)
-        visible_cols = [
-            "Date Submitted", "Expiry", "Outlet", "Item Name", "Barcode", "Qty", "Unit", 
-            "Action Took", "Staff Name", "Supplier", "Remarks", "Cost", "Selling", "GP%", "Form Type"
-        ]
-
-        # 3. Interactive Data Editor
-        edited_df = st.data_editor(
-            df_filtered[visible_cols + ['GSHEET_ROW_INDEX']], # Include index for saving
+        # 4. Interactive Data Editor
+        # Editor positions only mean something for one page, so each view (and
+        # each batch of staged edits) gets its own editor state
+        view_key = (snapshot.version, date_range, expiry_days, form_type_filter, action_status_filter,
+                    drill, search_text, sort_by, sort_desc, page, page_size)
+        editor_key = f"action_editor_{hash(view_key) & 0xFFFFFFFF:x}_{st.session_state.editor_version}"
+        st.data_editor(
+            df_page,
             column_config=column_config,
             disabled=[col for col in visible_cols if col != "Action Took"], # Disable all but Action Took
-            key="action_editor",
+            key=editor_key,
             use_container_width=True,
             height=400
         )
         
-        # Check if the edited data is different from the original data (only used to enable save button)
-        # Note: We compare the edited view against the *filtered* original view
-        is_modified = not edited_df.equals(df_filtered[visible_cols + ['GSHEET_ROW_INDEX']])
+        # Edits are read from the editor's own delta (O(edits)), mapped back to
+        # sheet rows through GSHEET_ROW_INDEX and kept in the session overlay, so
+        # they survive paging, sorting and searching until saved
+        editor_state = st.session_state.get(editor_key) or {}
+        page_changes = pending_action_edits(df_page, editor_state.get("edited_rows", {}))
+        if not page_changes.empty:
+            stage_action_edits(snapshot, st.session_state.action_overlay, page_changes)
+            # The editor on screen still has the old key: rerun now so the next edit is
+            # read from the new (fresh) editor rather than dropped with the old key's state
+            st.session_state.editor_version += 1
+            st.rerun()
+        is_modified = bool(st.session_state.action_overlay)
 
-        # 4. Save Button
+        # 5. Save Button
         st.markdown("---")
         col_save, col_spacer = st.columns([1, 4])
         
         with col_save:
             if st.button("💾 Save All Changes to Google Sheet", type="primary", disabled=not is_modified):
-                # 1. Update the full df_edited state with changes from the filtered view
-                df_temp = st.session_state.df_edited.set_index('GSHEET_ROW_INDEX')
-                for index, row in edited_df.iterrows():
-                    gsheet_row_index = row['GSHEET_ROW_INDEX']
-                    # We only care about the Action Took column change
-                    df_temp.loc[gsheet_row_index, 'Action Took'] = row['Action Took']
-                
-                st.session_state.df_edited = df_temp.reset_index()
-                
-                # 2. Save the full state
-                save_edited_data(st.session_state.df_gsheet, st.session_state.df_edited, items_worksheet)
+                # Only the rows in this session's overlay are written
+                st.session_state.editor_version += 1
+                save_edited_data(snapshot, st.session_state.action_overlay, items_worksheet)
             
-        if not is_modified:
+        if is_modified:
+            st.caption(f"✏️ {len(st.session_state.action_overlay)} pending change(s) not yet saved.")
+        else:
             st.caption("Edit a cell in the 'Action Took' column to enable the Save button.")
 
 elif not sheets_connected:
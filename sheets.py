@@ -0,0 +1,300 @@
+"""
+Google Sheets connection layer shared across Streamlit reruns and sessions.
+
+The app wraps one SheetsConnection in @st.cache_resource, so authorization
+and open_by_url run once per process instead of on every interaction.
+
+Storage backends: anything with a `worksheet(name)` method returning an
+object that supports get_all_values, row_values, append_row, append_rows,
+batch_update and batch_get with gspread's semantics. Two exist:
+- SheetsConnection below (live Google Sheets, the default)
+- local_sheets.LocalSheetsBackend (SQLite emulator for offline load tests)
+Both apps pick one from the SHEETS_BACKEND environment variable.
+
+Every call, on either backend, goes through one process-wide
+RequestScheduler (ScheduledBackend / ScheduledWorksheet). It enforces the
+read and write quotas with token buckets and retries 429, 5xx and network
+errors with jittered exponential backoff.
+"""
+import os
+import random
+import threading
+import time
+
+import gspread
+import requests
+from google.auth.exceptions import RefreshError
+from google.oauth2.service_account import Credentials
+
+SCOPES = ["https://spreadsheets.google.com/feeds",
+          "https://www.googleapis.com/auth/drive"]
+
+# "gspread" (live Google Sheets) or "local" (local_sheets.py, configured by SHEETS_LOCAL_*)
+SHEETS_BACKEND = os.environ.get("SHEETS_BACKEND", "gspread").strip().lower()
+
+# Google's default Sheets API quota is 60 read and 60 write requests per minute per user
+READS_PER_MINUTE = int(os.environ.get("SHEETS_READS_PER_MINUTE", "60"))
+WRITES_PER_MINUTE = int(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60"))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _is_auth_expired(error):
+    """True for errors that a fresh client/token would fix."""
+    if isinstance(error, RefreshError):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error.response, "status_code", None) == 401
+    return False
+
+
+class SheetsConnection:
+    """
+    Lazily authorized client for one spreadsheet.
+
+    - The client is created on first use, the spreadsheet is opened on the
+      first worksheet call, and each worksheet handle is resolved once.
+    - google-auth refreshes the access token in place before it expires.
+    - If a call still fails with an auth error (revoked/expired token), the
+      cached client and handles are dropped and the call is retried once on
+      a fresh connection.
+    """
+
+    def __init__(self, credentials_info, sheet_url, scopes=SCOPES):
+        # Parse credentials up front so a bad secret fails at startup
+        self._credentials = Credentials.from_service_account_info(credentials_info, scopes=scopes)
+        self._sheet_url = sheet_url
+        self._lock = threading.Lock()
+        self._spreadsheet = None
+        self._worksheets = {}
+
+    def _reset(self):
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = {}
+
+    def _resolve(self, name):
+        with self._lock:
+            if name not in self._worksheets:
+                if self._spreadsheet is None:
+                    client = gspread.authorize(self._credentials)
+                    self._spreadsheet = client.open_by_url(self._sheet_url)
+                self._worksheets[name] = self._spreadsheet.worksheet(name)
+            return self._worksheets[name]
+
+    def call(self, name, method, *args, **kwargs):
+        """Runs `worksheet.<method>(*args, **kwargs)`, reconnecting once on auth expiry."""
+        try:
+            return getattr(self._resolve(name), method)(*args, **kwargs)
+        except Exception as e:
+            if not _is_auth_expired(e):
+                raise
+            self._reset()
+            return getattr(self._resolve(name), method)(*args, **kwargs)
+
+    def worksheet(self, name):
+        """Returns a handle whose calls go through `call` (no network until first use)."""
+        return WorksheetHandle(self, name)
+
+
+class WorksheetHandle:
+    """Drop-in for a gspread Worksheet for the calls the apps make."""
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self.title = name
+
+    def get_all_values(self, *args, **kwargs):
+        return self._connection.call(self.title, "get_all_values", *args, **kwargs)
+
+    def row_values(self, *args, **kwargs):
+        return self._connection.call(self.title, "row_values", *args, **kwargs)
+
+    def append_row(self, *args, **kwargs):
+        return self._connection.call(self.title, "append_row", *args, **kwargs)
+
+    def append_rows(self, *args, **kwargs):
+        return self._connection.call(self.title, "append_rows", *args, **kwargs)
+
+    def batch_update(self, *args, **kwargs):
+        return self._connection.call(self.title, "batch_update", *args, **kwargs)
+
+    def batch_get(self, *args, **kwargs):
+        return self._connection.call(self.title, "batch_get", *args, **kwargs)
+
+
+# ==========================================
+# QUOTA-AWARE REQUEST SCHEDULER
+# ==========================================
+def _error_status(error):
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error.response, "status_code", None) or error.code
+    return None
+
+
+def _is_retryable(error):
+    return (_error_status(error) in RETRYABLE_STATUS
+            or isinstance(error, (requests.ConnectionError, requests.Timeout)))
+
+
+def is_permanent_error(error):
+    """
+    True for failures that sending the same request again cannot fix: bad
+    credentials, a wrong spreadsheet URL or worksheet name, or an HTTP 4xx
+    other than 429 (SheetsConnection has already retried a 401 once).
+    """
+    if isinstance(error, (RefreshError, gspread.exceptions.SpreadsheetNotFound,
+                          gspread.exceptions.WorksheetNotFound)):
+        return True
+    status = _error_status(error)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` calls per minute with bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestScheduler:
+    """
+    Runs Sheets calls under read/write token buckets and retries transient
+    failures (429, 5xx, connection errors) with full-jitter exponential
+    backoff: sleep uniform(0, min(max_delay, base_delay * 2**attempt)).
+
+    A 429 means the request was rejected, so it is always safe to resend.
+    A 5xx or a dropped connection is ambiguous for writes. Callers can pass
+    `already_applied`, which is checked before resending, so a retried
+    append cannot create duplicate rows.
+    """
+
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE,
+                 max_retries=5, base_delay=1.0, max_delay=32.0):
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, burst=reads_per_minute // 6),
+            "write": TokenBucket(writes_per_minute, burst=writes_per_minute // 6),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def run(self, kind, fn, already_applied=None):
+        attempt = 0
+        verify_first = False
+        while True:
+            self.buckets[kind].acquire()
+            try:
+                if verify_first:
+                    if already_applied():
+                        return None
+                    verify_first = False
+                return fn()
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if already_applied is not None and _error_status(e) != 429:
+                    # Ambiguous failure: check before the write is sent again
+                    verify_first = True
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            attempt += 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every worksheet of both backends."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def _same_cell(sent, stored):
+    sent = "" if sent is None else str(sent)
+    if sent == stored:
+        return True
+    try:
+        return float(sent) == float(stored)
+    except ValueError:
+        return False
+
+
+def rows_at_tail(worksheet, rows):
+    """
+    True if the last len(rows) rows of `worksheet` hold `rows`, i.e. an
+    append of them has already landed (one column read to find the end,
+    one range read).
+    """
+    last_row = len(worksheet.batch_get(["A:A"])[0])
+    if not rows or last_row < len(rows):
+        return False
+    first_row = last_row - len(rows) + 1
+    tail = worksheet.batch_get([f"{first_row}:{last_row}"])[0]
+    tail += [[]] * (len(rows) - len(tail))
+    return all(
+        all(_same_cell(v, got[i] if i < len(got) else "") for i, v in enumerate(sent))
+        for sent, got in zip(rows, tail)
+    )
+
+
+class ScheduledWorksheet:
+    """Wraps any worksheet so its calls are rate limited and retried."""
+
+    def __init__(self, worksheet, scheduler=None):
+        self._worksheet = worksheet
+        self._scheduler = scheduler or get_scheduler()
+        self.title = worksheet.title
+
+    def get_all_values(self, *args, **kwargs):
+        return self._scheduler.run("read", lambda: self._worksheet.get_all_values(*args, **kwargs))
+
+    def row_values(self, *args, **kwargs):
+        return self._scheduler.run("read", lambda: self._worksheet.row_values(*args, **kwargs))
+
+    def batch_get(self, *args, **kwargs):
+        return self._scheduler.run("read", lambda: self._worksheet.batch_get(*args, **kwargs))
+
+    def batch_update(self, *args, **kwargs):
+        # Writing the same values twice is harmless, so plain retries are safe
+        return self._scheduler.run("write", lambda: self._worksheet.batch_update(*args, **kwargs))
+
+    def append_row(self, values, **kwargs):
+        return self._append([values], lambda: self._worksheet.append_row(values, **kwargs))
+
+    def append_rows(self, values, **kwargs):
+        return self._append(values, lambda: self._worksheet.append_rows(values, **kwargs))
+
+    def _append(self, rows, send):
+        # Did the failed append land anyway? Compare the sheet's last rows with what was sent.
+        return self._scheduler.run("write", send, already_applied=lambda: rows_at_tail(self._worksheet, rows))
+
+
+class ScheduledBackend:
+    """Backend wrapper whose worksheets all share one RequestScheduler."""
+
+    def __init__(self, backend, scheduler=None):
+        self._backend = backend
+        self._scheduler = scheduler or get_scheduler()
+
+    def worksheet(self, name):
+        return ScheduledWorksheet(self._backend.worksheet(name), self._scheduler)
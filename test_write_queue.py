@@ -0,0 +1,82 @@
+"""
+Restart behaviour of SheetsWriteQueue against the offline backend: a batch
+that reached the sheet without being acknowledged must not be sent again.
+"""
+from local_sheets import LocalSheetsBackend
+from write_queue import ACKNOWLEDGED, FAILED, PENDING, SheetsWriteQueue
+
+HEADERS = ["Barcode", "Qty"]
+
+
+class FailingAppend:
+    """
+    Backend whose next append_rows fails, like a process stopping during the
+    call; with `lands` the rows reach the sheet before the failure.
+    """
+
+    def __init__(self, backend, lands):
+        self._backend = backend
+        self.lands = lands
+        self.crash = True
+
+    def worksheet(self, name):
+        worksheet = self._backend.worksheet(name)
+        append_rows = worksheet.append_rows
+
+        def append_and_fail(rows, **kwargs):
+            if not self.crash:
+                return append_rows(rows, **kwargs)
+            self.crash = False
+            if self.lands:
+                append_rows(rows, **kwargs)
+            raise ConnectionError("stopped before the acknowledgement")
+
+        worksheet.append_rows = append_and_fail
+        return worksheet
+
+
+def _queue(backend, tmp_path):
+    # A long interval keeps the background thread idle; the tests flush directly
+    return SheetsWriteQueue(backend, path=str(tmp_path / "outbox.db"), flush_interval=3600)
+
+
+def _flush_and_stop(queue):
+    try:
+        queue.flush()
+    except ConnectionError:
+        pass
+
+
+def _data_rows(backend):
+    return backend.worksheet("Items").get_all_values()[1:]
+
+
+def test_unacknowledged_batch_is_not_resent_after_restart(tmp_path):
+    sheet = LocalSheetsBackend(path=str(tmp_path / "sheet.db"))
+    first = _queue(FailingAppend(sheet, lands=True), tmp_path)
+    first.enqueue("Items", HEADERS, [["a", 1], ["b", 2], ["c", 3]], submission_id="s1")
+    _flush_and_stop(first)
+    assert _data_rows(sheet) == [["a", "1"], ["b", "2"], ["c", "3"]]
+
+    # Restart, then a new submission arrives before the next flush
+    second = _queue(sheet, tmp_path)
+    second.enqueue("Items", HEADERS, [["d", 4]], submission_id="s2")
+    assert second.flush() == 4
+
+    assert _data_rows(sheet) == [["a", "1"], ["b", "2"], ["c", "3"], ["d", "4"]]
+    assert second.status("s1") == {PENDING: 0, ACKNOWLEDGED: 3, FAILED: 0}
+    assert second.status("s2") == {PENDING: 0, ACKNOWLEDGED: 1, FAILED: 0}
+
+
+def test_batch_that_did_not_land_is_sent_after_restart(tmp_path):
+    sheet = LocalSheetsBackend(path=str(tmp_path / "sheet.db"))
+    first = _queue(FailingAppend(sheet, lands=False), tmp_path)
+    first.enqueue("Items", HEADERS, [["a", 1], ["b", 2]], submission_id="s1")
+    _flush_and_stop(first)
+    assert _data_rows(sheet) == []
+
+    second = _queue(sheet, tmp_path)
+    second.enqueue("Items", HEADERS, [["c", 3]], submission_id="s2")
+    assert second.flush() == 3
+    assert _data_rows(sheet) == [["a", "1"], ["b", "2"], ["c", "3"]]
+    assert second.pending_count() == 0
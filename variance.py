@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import gspread 
-from google.oauth2.service_account import Credentials 
+from sheets import SHEETS_BACKEND, ScheduledBackend, SheetsConnection
+from local_sheets import LocalSheetsBackend
+from write_queue import SheetsWriteQueue
+from item_journal import ItemJournal
+from duplicate_index import SubmissionKeyIndex, submission_key
+from item_master import ITEM_MASTER_COLUMNS, BarcodeIndex, ItemNameIndex, load_item_master
+from bulk_entry import BULK_COLUMNS, merge_repeats, parse_scanner_text, prepare_bulk_items, read_bulk_csv
 
 # ==========================================
 # PAGE CONFIG
@@ -18,20 +23,58 @@ ITEMS_SHEET_NAME = "Items"
 FEEDBACK_SHEET_NAME = "Feedback"
 
 # 2. Authorization
-try:
-    scope = ["https://spreadsheets.google.com/feeds",
-             "https://www.googleapis.com/auth/drive"]
-
+# The connection is shared by every session and rerun in this process;
+# the spreadsheet and worksheets are only opened on first use.
+@st.cache_resource(show_spinner="Connecting to Google Sheets...")
+def get_sheets_connection():
+    # SHEETS_BACKEND=local swaps in the offline SQLite emulator (local_sheets.py)
+    if SHEETS_BACKEND == "local":
+        return ScheduledBackend(LocalSheetsBackend.from_env())
     # Load credentials from Streamlit Secrets (same as your first app)
-    creds = Credentials.from_service_account_info(
-        st.secrets["google_service_account"], scopes=scope
-    )
-
-    # Authorize client and open the spreadsheet
-    client = gspread.authorize(creds)
-    sh = client.open_by_url(SHEET_URL)
-    items_worksheet = sh.worksheet(ITEMS_SHEET_NAME) # Target for Outlet Dashboard data
-    feedback_worksheet = sh.worksheet(FEEDBACK_SHEET_NAME) # Target for Feedback data
+    # Every call is rate limited and retried with backoff (sheets.RequestScheduler)
+    return ScheduledBackend(SheetsConnection(st.secrets["google_service_account"], SHEET_URL))
+
+# 3. Background writer: submissions go to a local outbox and are appended in batches
+WRITE_QUEUE_PATH = "sheets_outbox.db"
+
+@st.cache_resource
+def get_write_queue():
+    """One durable write queue (and writer thread) per process, shared by every session."""
+    return SheetsWriteQueue(get_sheets_connection(), path=WRITE_QUEUE_PATH)
+
+# 4. Local journal of each outlet/staff's in-progress item list (survives reconnects and restarts)
+ITEM_JOURNAL_PATH = "item_journal.db"
+
+@st.cache_resource
+def get_item_journal():
+    """One journal connection per process, shared by every session."""
+    return ItemJournal(path=ITEM_JOURNAL_PATH)
+
+item_journal = get_item_journal()
+
+# 5. Recent submission keys, to catch the same item being submitted twice on one day
+@st.cache_resource
+def get_submission_index():
+    """Keys of recent Items rows plus rows still in the write queue, shared by every session."""
+    index = SubmissionKeyIndex(get_sheets_connection().worksheet(ITEMS_SHEET_NAME))
+    for headers, row in get_write_queue().pending_rows(ITEMS_SHEET_NAME):
+        index.add_rows(headers, [row])
+    return index
+
+def find_duplicates(items):
+    """The items (dicts) whose submission key is already in the Items sheet or the write queue."""
+    try:
+        submission_index.refresh() # Reads only rows appended since the last refresh
+    except Exception:
+        pass # Check against the keys already known rather than block the staff
+    return [item for item in items if submission_key(item) in submission_index]
+
+try:
+    connection = get_sheets_connection()
+    items_worksheet = connection.worksheet(ITEMS_SHEET_NAME) # Target for Outlet Dashboard data
+    feedback_worksheet = connection.worksheet(FEEDBACK_SHEET_NAME) # Target for Feedback data
+    write_queue = get_write_queue()
+    submission_index = get_submission_index()
     
     # Flag for successful connection
     sheets_connected = True
@@ -141,18 +184,18 @@ def inject_numeric_keyboard_script(target_label):
 # ==========================================
 # LOAD ITEM DATA (for auto-fill) (Existing)
 # ==========================================
-@st.cache_data
+# Read-only and shared by every session: cache_resource hands back the same
+# frame, where cache_data would unpickle a fresh copy on every rerun
+@st.cache_resource
 def load_item_data():
     # NOTE: The actual file "alllist.xlsx" must be present in the directory 
     file_path = "ItemSearchList_31102025_1159 (1).xlsx" 
     try:
-        df = pd.read_excel(file_path)
-        # Ensure column names are clean
-        df.columns = df.columns.str.strip()
+        # Reads the columnar snapshot; the workbook is only parsed when it has changed
+        df = load_item_master(file_path)
         
         # Check only critical columns needed for the app to run
-        required_cols = ["Item Bar Code", "Item Name", "LP Supplier"] 
-        for col in required_cols:
+        for col in ITEM_MASTER_COLUMNS:
             if col not in df.columns:
                 st.error(f"⚠️ Missing critical column: '{col}' in alllist.xlsx. Please check the file.")
                 return pd.DataFrame()
@@ -165,6 +208,20 @@ def load_item_data():
 
 item_data = load_item_data()
 
+@st.cache_resource
+def load_barcode_index():
+    """Builds the normalized barcode -> row index once per process (policy in item_master.py)."""
+    return BarcodeIndex(load_item_data())
+
+barcode_index = load_barcode_index()
+
+@st.cache_resource
+def load_name_index():
+    """Word-prefix / trigram index over item names and suppliers, built once per process."""
+    return ItemNameIndex(load_item_data())
+
+name_index = load_name_index()
+
 # ==========================================
 # LOGIN SYSTEM (Existing)
 # ==========================================
@@ -180,18 +237,26 @@ for key in ["logged_in", "selected_outlet", "submitted_items",
              "barcode_value", "item_name_input", "supplier_input", 
              "temp_item_name_manual", "temp_supplier_manual",
              "lookup_data", "submitted_feedback", "barcode_found",
-             "staff_name"]: 
+             "staff_name", "submissions", "journal_ids", "journal_owner",
+             "bulk_rows"]: 
     
     if key not in st.session_state:
-        if key in ["submitted_items", "submitted_feedback"]:
+        if key in ["submitted_items", "submitted_feedback", "submissions", "journal_ids"]:
             st.session_state[key] = []
-        elif key == "lookup_data":
+        elif key in ["lookup_data", "bulk_rows"]:
             st.session_state[key] = pd.DataFrame()
         elif key == "barcode_found":
             st.session_state[key] = False 
         else:
             st.session_state[key] = ""
 
+if "bulk_version" not in st.session_state:
+    st.session_state.bulk_version = 0 # Bumped whenever bulk_rows is replaced, to reset the fix-up editor
+
+def set_bulk_rows(rows):
+    st.session_state.bulk_rows = rows
+    st.session_state.bulk_version += 1
+
 # --- Helper functions to synchronize manual inputs --- (Existing)
 def update_item_name_state():
     """Updates the main item_name_input state variable from the temp manual input."""
@@ -200,6 +265,42 @@ def update_item_name_state():
 def update_supplier_state():
     """Updates the main supplier_input state variable from the temp manual input."""
     st.session_state.supplier_input = st.session_state.temp_supplier_manual
+
+def apply_item_suggestion():
+    """Fills the manual item name and supplier from the picked item master suggestion."""
+    pos = st.session_state.get("item_suggestion")
+    if pos is None:
+        return
+    row = item_data.iloc[pos]
+    st.session_state.item_name_input = str(row["Item Name"])
+    st.session_state.supplier_input = str(row["LP Supplier"])
+    st.session_state.temp_item_name_manual = st.session_state.item_name_input
+    st.session_state.temp_supplier_manual = st.session_state.supplier_input
+# ------------------------------------------------------------------
+
+def restore_item_list(outlet_name, staff_name):
+    """
+    Loads the open journal entries of this outlet and staff as the session's
+    item list. Items already on the list are moved to the new name first, so
+    correcting a typo in the staff name does not clear the list.
+    """
+    listed = st.session_state.submitted_items
+    if not staff_name.strip():
+        if listed:
+            return # Name cleared to be retyped: the list keeps its current owner
+        entry_ids, items = [], []
+    else:
+        if listed:
+            for item in listed:
+                item["Staff Name"] = staff_name.strip()
+            item_journal.move_entries(outlet_name, staff_name, st.session_state.journal_ids, listed)
+        entry_ids, items = item_journal.open_entries(outlet_name, staff_name)
+    st.session_state.journal_ids = entry_ids    # Parallel to submitted_items
+    st.session_state.submitted_items = items
+    st.session_state.journal_owner = ItemJournal.owner(outlet_name, staff_name)
+    restored = len(items) - len(listed)
+    if restored > 0:
+        st.toast(f"♻️ Restored {restored} unsubmitted item(s) for {staff_name.strip()}.", icon="📋")
 # ------------------------------------------------------------------
 
 # --- Lookup Logic Function (Callback for Barcode Form) --- (Existing)
@@ -218,17 +319,18 @@ def lookup_item_and_update_state():
     # Reset temporary keys for manual entry fields
     st.session_state.temp_item_name_manual = ""
     st.session_state.temp_supplier_manual = "" 
+    st.session_state.item_name_search = ""
     
     if not barcode:
         st.toast("⚠️ Barcode cleared.", icon="❌")
         return
 
     if not item_data.empty:
-        match = item_data[item_data["Item Bar Code"].astype(str).str.strip() == str(barcode).strip()]
+        match_pos = barcode_index.lookup(barcode)
         
-        if not match.empty:
+        if match_pos is not None:
             st.session_state.barcode_found = True
-            row = match.iloc[0]
+            row = item_data.iloc[match_pos]
             
             # 1. Prepare data for display table
             df_display = row[["Item Name", "LP Supplier"]].to_frame().T
@@ -274,7 +376,7 @@ def process_item_entry(barcode, item_name, qty, cost, selling, expiry, supplier,
     expiry_display = expiry.strftime("%d-%b-%y") if expiry else ""
     gp = ((selling - cost) / cost * 100) if cost else 0
 
-    st.session_state.submitted_items.append({
+    item = {
         "Date Submitted": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
         "Form Type": form_type,
         "Barcode": barcode.strip(),
@@ -289,7 +391,19 @@ def process_item_entry(barcode, item_name, qty, cost, selling, expiry, supplier,
         "Remarks": remarks.strip(),
         "Outlet": outlet_name,
         "Staff Name": staff_name.strip() 
-    })
+    }
+
+    # Same outlet, barcode, expiry and form type already submitted (or listed) today
+    key = submission_key(item)
+    if any(submission_key(listed) == key for listed in st.session_state.submitted_items):
+        st.toast("⚠️ This item (same barcode, expiry and form type) is already in your list.", icon="❌")
+        return False
+    if sheets_connected and find_duplicates([item]):
+        st.toast("⚠️ This item (same barcode, expiry and form type) was already submitted today.", icon="❌")
+        return False
+    # Journaled first, so the item survives a dropped connection or a restart
+    st.session_state.journal_ids.append(item_journal.record_add(outlet_name, staff_name, item))
+    st.session_state.submitted_items.append(item)
 
     # --- CLEAR ONLY THE NON-FORM/NON-ITEM STATE VARIABLES ---
     st.session_state.barcode_value = ""          
@@ -301,72 +415,132 @@ def process_item_entry(barcode, item_name, qty, cost, selling, expiry, supplier,
 # -------------------------------------------------
 
 
+# -------------------------------------------------
+# --- Bulk Add: many items from a CSV or scanner paste ---
+# -------------------------------------------------
+def add_bulk_items(items, outlet_name, staff_name):
+    """
+    Adds the rows of `items` (built by prepare_bulk_items) to the list, skipping
+    any already listed, repeated in the batch, or submitted today. Returns
+    (added, skipped) counts.
+    """
+    items = items.to_dict("records")
+    listed = {submission_key(item) for item in st.session_state.submitted_items}
+    duplicates = find_duplicates(items) if sheets_connected else []
+    listed.update(submission_key(item) for item in duplicates)
+    new_items = []
+    for item in items:
+        key = submission_key(item)
+        if key not in listed:
+            listed.add(key)
+            new_items.append(item)
+    if new_items:
+        # One journal transaction for the whole batch, before the list changes
+        st.session_state.journal_ids.extend(item_journal.record_adds(outlet_name, staff_name, new_items))
+        st.session_state.submitted_items.extend(new_items)
+    return len(new_items), len(items) - len(new_items)
+
+
 # -------------------------------------------------
 # --- Function to Submit ALL Collected Data to Google Sheets ---
 # -------------------------------------------------
 def submit_all_items_to_sheets():
-    """Takes all items in session_state and appends them to the Items Google Sheet."""
+    """Queues all items in session_state for the Items Google Sheet (written in the background)."""
     if not sheets_connected:
         st.error("Cannot submit: Google Sheets not connected.")
         return
 
+    # Another session (or an earlier Submit All) may have sent the same items since they were listed.
+    # A retry of a submit that was queued but not marked committed is not a duplicate.
+    counts = write_queue.status(ItemJournal.submission_id(st.session_state.journal_ids))
+    retry = sum(counts.values()) > 0
+    duplicates = [] if retry else find_duplicates(st.session_state.submitted_items)
+    if duplicates:
+        names = ", ".join(f"{item['Item Name']} ({item['Barcode']})" for item in duplicates)
+        st.error(f"⚠️ Already submitted today: {names}. Remove these from the list before submitting.")
+        return False
+
     df_to_upload = pd.DataFrame(st.session_state.submitted_items)
+    entry_ids = list(st.session_state.journal_ids)
     
     # Prepare data rows for gspread
     headers = list(df_to_upload.columns)
-    
-    try:
-        current_headers = items_worksheet.row_values(1)
-        if not current_headers:
-             items_worksheet.append_row(headers)
-    except Exception as e:
-        st.error(f"Error checking/writing headers to '{ITEMS_SHEET_NAME}': {e}")
-        return
 
     # Convert DataFrame to a list of lists (rows)
     data_rows = df_to_upload.values.tolist()
     
     try:
-        # Append all rows at once for efficiency
-        items_worksheet.append_rows(data_rows) 
-        st.success(f"✅ Successfully submitted {len(st.session_state.submitted_items)} items to Google Sheet: '{ITEMS_SHEET_NAME}'!")
-        return True
+        # Durable local queue; the writer thread appends it with other outlets' rows.
+        # The id comes from the journal entries, so a retried submit is not queued twice.
+        submission_id = write_queue.enqueue(ITEMS_SHEET_NAME, headers, data_rows,
+                                            submission_id=ItemJournal.submission_id(entry_ids))
+        item_journal.commit(st.session_state.selected_outlet, st.session_state.staff_name, entry_ids, submission_id)
+        submission_index.add_rows(headers, data_rows)
+        write_queue.flush_now()
     except Exception as e:
-        st.error(f"❌ Error submitting items to Google Sheet: {e}")
+        st.error(f"❌ Error queuing items for Google Sheet: {e}")
         return False
+
+    st.session_state.submissions.append({
+        "id": submission_id,
+        "label": f"{len(data_rows)} item(s) at {datetime.now().strftime('%H:%M:%S')}",
+    })
+    st.success(f"✅ {len(data_rows)} items queued for Google Sheet: '{ITEMS_SHEET_NAME}'!")
+    return True
 # -------------------------------------------------
 
 # -------------------------------------------------
 # --- Function to Submit Single Feedback to Google Sheets ---
 # -------------------------------------------------
 def submit_feedback_to_sheets(feedback_entry):
-    """Appends a single feedback entry (dictionary) to the Feedback Google Sheet."""
+    """Queues a single feedback entry (dictionary) for the Feedback Google Sheet."""
     if not sheets_connected:
         st.error("Cannot submit: Google Sheets not connected.")
         return False
         
     # Get header row (in the order you want)
     headers = list(feedback_entry.keys())
-    
-    # Check if headers exist in the sheet
-    try:
-        current_headers = feedback_worksheet.row_values(1)
-        if not current_headers:
-             feedback_worksheet.append_row(headers)
-    except Exception as e:
-        st.error(f"Error checking/writing headers to '{FEEDBACK_SHEET_NAME}': {e}")
-        return False
 
     # Get values in the order of the keys (headers)
     data_row = list(feedback_entry.values())
     
     try:
-        # Append the single row
-        feedback_worksheet.append_row(data_row) 
-        return True
+        submission_id = write_queue.enqueue(FEEDBACK_SHEET_NAME, headers, [data_row])
+        write_queue.flush_now()
     except Exception as e:
         st.error(f"❌ Error submitting feedback to Google Sheet: {e}")
         return False
+
+    st.session_state.submissions.append({
+        "id": submission_id,
+        "label": f"Feedback from {feedback_entry.get('Customer Name', '')} at {datetime.now().strftime('%H:%M:%S')}",
+    })
+    return True
+# -------------------------------------------------
+
+# -------------------------------------------------
+# --- Submission Status (pending / acknowledged by Google Sheets) ---
+# -------------------------------------------------
+def show_submission_status():
+    """Lists this session's recent submissions with their write-queue status, and any write error."""
+    if not sheets_connected:
+        return
+    error = write_queue.last_error
+    if not st.session_state.submissions and error is None:
+        return
+
+    with st.sidebar.expander("📬 Submission Status", expanded=True):
+        if error is not None:
+            st.error(f"⚠️ Writing to Google Sheets failed ({write_queue.pending_count()} row(s) waiting): {error}")
+        for submission in reversed(st.session_state.submissions[-5:]):
+            counts = write_queue.status(submission["id"])
+            if counts["failed"]:
+                st.caption(f"❌ {submission['label']}: {counts['failed']} rejected by Google Sheet (kept in the outbox)")
+            elif counts["pending"]:
+                st.caption(f"⏳ {submission['label']}: {counts['pending']} pending")
+            else:
+                st.caption(f"✅ {submission['label']}: saved to Google Sheet")
+        st.button("🔄 Refresh Status", key="refresh_submission_status")
 # -------------------------------------------------
 
 
@@ -393,6 +567,7 @@ else:
     # st.markdown(CUSTOM_RATING_CSS, unsafe_allow_html=True) 
     
     page = st.sidebar.radio("📌 Select Page", ["Outlet Dashboard", "Customer Feedback"])
+    show_submission_status()
 
     # ==========================================
     # OUTLET DASHBOARD
@@ -414,6 +589,9 @@ else:
             key="staff_name_input_key", 
             placeholder="Enter your full name"
         )
+        # Bring back this staff member's unsubmitted list (after a reconnect or a restart)
+        if st.session_state.journal_owner != ItemJournal.owner(outlet_name, st.session_state.staff_name):
+            restore_item_list(outlet_name, st.session_state.staff_name)
         st.markdown("---")
 
         # --- 1. Dedicated Lookup Form (Existing) ---
@@ -447,18 +625,41 @@ else:
         # --- 2b. Manual Entry Fallback (Existing) ---
         if st.session_state.barcode_value.strip() and not st.session_state.barcode_found:
              st.markdown("### ⚠️ Manual Item Entry (Barcode Not Found)")
+
+             # Suggestions from the item master keep names consistent with the catalog
+             name_query = st.text_input(
+                 "Search Item Master (name or supplier)",
+                 key="item_name_search",
+                 placeholder="Type part of the item name, e.g. 'almarai milk'"
+             )
+             if name_query.strip() and not item_data.empty:
+                 suggestions = name_index.search(name_query, limit=10)
+                 if suggestions:
+                     col_suggest, col_use = st.columns([5, 1])
+                     with col_suggest:
+                         st.selectbox(
+                             "Suggestions",
+                             options=suggestions,
+                             format_func=lambda pos: f"{item_data.iloc[pos]['Item Name']} — {item_data.iloc[pos]['LP Supplier']}",
+                             key="item_suggestion"
+                         )
+                     with col_use:
+                         st.markdown("<div style='height: 28px;'></div>", unsafe_allow_html=True) # Spacer
+                         st.button("Use Item", on_click=apply_item_suggestion, use_container_width=True)
+                 else:
+                     st.caption("No similar items in the item master. Enter the details below.")
+
              col_manual_name, col_manual_supplier = st.columns(2)
              with col_manual_name:
+                 # Value lives in session state (set by the lookup and suggestion callbacks)
                  st.text_input(
                      "Item Name (Manual)", 
-                     value=st.session_state.item_name_input, 
                      key="temp_item_name_manual", 
                      on_change=update_item_name_state
                  )
              with col_manual_supplier:
                  st.text_input(
                      "Supplier Name (Manual)", 
-                     value=st.session_state.supplier_input, 
                      key="temp_supplier_manual", 
                      on_change=update_supplier_state
                  )
@@ -536,6 +737,72 @@ else:
                  st.rerun()
 
 
+        # --- 3. Bulk Add (CSV upload or pasted scanner output) ---
+        with st.expander("📦 Bulk Add (CSV or scanner paste)"):
+            st.caption("One item per line: barcode, qty, expiry, cost, selling. CSV files may also have Remarks, "
+                       "Item Name and Supplier columns. Repeated lines of the same item are added up, and a "
+                       "blank cost is taken from the item master where it has one.")
+            bulk_file = st.file_uploader("Upload CSV", type=["csv", "txt"], key="bulk_file")
+            bulk_text = st.text_area("Or paste scanner output", key="bulk_text", height=150,
+                                     placeholder="6291234567890, 2, 31-Dec-25, 4.50, 5.25")
+            if st.button("📥 Load Items", key="bulk_load"):
+                try:
+                    rows = [read_bulk_csv(bulk_file)] if bulk_file is not None else []
+                    if bulk_text.strip():
+                        rows.append(parse_scanner_text(bulk_text))
+                    # The same item in both the file and the paste is added up too
+                    set_bulk_rows(merge_repeats(pd.concat(rows, ignore_index=True)) if rows else pd.DataFrame())
+                    if not rows:
+                        st.toast("⚠️ Upload a CSV or paste scanner output first.", icon="❌")
+                except Exception as e:
+                    st.error(f"⚠️ Could not read the bulk items: {e}")
+
+            if not st.session_state.bulk_rows.empty:
+                # One vectorized join against the item master for every row
+                bulk_items, bulk_problems = prepare_bulk_items(
+                    st.session_state.bulk_rows, item_data, barcode_index, form_type,
+                    outlet_name, st.session_state.staff_name, datetime.now(),
+                )
+                # Rows with only a warning are ready and listed below as well
+                to_fix = bulk_problems.index.difference(bulk_items.index)
+                warned = len(bulk_problems) - len(to_fix)
+                st.markdown(f"**{len(bulk_items)} ready**, **{len(to_fix)} need fixing**"
+                            + (f" ({warned} ready with a warning)" if warned else ""))
+                if not bulk_items.empty:
+                    st.dataframe(bulk_items.drop(columns=["Date Submitted", "Outlet", "Staff Name"]),
+                                 use_container_width=True, hide_index=True)
+                if not bulk_problems.empty:
+                    fixed = st.data_editor(
+                        bulk_problems, key=f"bulk_fixes_{st.session_state.bulk_version}", use_container_width=True, hide_index=True,
+                        disabled=["Problem", "Master Item"], column_order=["Problem", "Master Item"] + BULK_COLUMNS,
+                    )
+                    if st.button("🔁 Apply Fixes", key="bulk_apply"):
+                        set_bulk_rows(merge_repeats(pd.concat(
+                            [st.session_state.bulk_rows.drop(index=bulk_problems.index),
+                             fixed.drop(columns=["Problem", "Master Item"])],
+                            ignore_index=True,
+                        )))
+                        st.rerun()
+
+                col_add, col_clear = st.columns([1, 1])
+                with col_add:
+                    if st.button(f"➕ Add {len(bulk_items)} Items to List", key="bulk_add", type="primary",
+                                 disabled=bulk_items.empty):
+                        if not st.session_state.staff_name.strip():
+                            st.toast("❌ Please enter your Staff Name before adding to the list.", icon="❌")
+                        else:
+                            added, skipped = add_bulk_items(bulk_items, outlet_name, st.session_state.staff_name)
+                            # Rows that still need fixing stay loaded
+                            set_bulk_rows(st.session_state.bulk_rows.loc[to_fix])
+                            st.toast(f"✅ Added {added} item(s) to the list."
+                                     + (f" Skipped {skipped} already listed or submitted today." if skipped else ""),
+                                     icon="➕")
+                            st.rerun()
+                with col_clear:
+                    if st.button("🗑️ Clear Bulk Items", key="bulk_clear"):
+                        set_bulk_rows(pd.DataFrame())
+                        st.rerun()
+
         # Displaying and managing the list
         if st.session_state.submitted_items:
             st.markdown("### 🧾 Items Added")
@@ -548,6 +815,7 @@ else:
                     if submit_all_items_to_sheets(): 
                         # FINAL RESET OF ITEM LOOKUP DATA AND STAFF NAME
                         st.session_state.submitted_items = []
+                        st.session_state.journal_ids = []
                         st.session_state.barcode_value = ""
                         st.session_state.item_name_input = ""
                         st.session_state.supplier_input = ""
@@ -565,6 +833,8 @@ else:
                     if to_delete != "Select item to remove...":
                         if st.button("❌ Delete Selected", type="secondary"):
                             index = options.index(to_delete) 
+                            item_journal.record_delete(outlet_name, st.session_state.staff_name,
+                                                       st.session_state.journal_ids.pop(index))
                             st.session_state.submitted_items.pop(index)
                             st.success("✅ Item removed")
                             st.rerun()
@@ -622,6 +892,6 @@ else:
                 # Submit to Google Sheet
                 if submit_feedback_to_sheets(new_feedback_entry):
                     st.session_state.submitted_feedback.append(new_feedback_entry)
-                    st.success("✅ Feedback submitted successfully to Google Sheets! The form has been cleared.")
+                    st.success("✅ Feedback submitted successfully! It will be saved to Google Sheets in the background. The form has been cleared.")
             else:
                 st.error("⚠️ Please fill **Customer Name** and **Feedback** before submitting.")
@@ -0,0 +1,233 @@
+"""
+Durable, batched write queue for Sheets submissions (used by variance.py).
+
+Submissions are committed to a local SQLite outbox and the call returns at
+once. A single background thread per process wakes every `flush_interval`
+seconds and writes all pending rows for a worksheet, from every session,
+with one append_rows call. Each row moves from 'pending' to 'sending'
+just before the call and to 'acknowledged' once it returns. Rows that fail
+are retried on the next flush, including after a restart, because the
+outbox lives on disk.
+
+A batch that fails with an error resending cannot fix (bad credentials, a
+wrong sheet, an HTTP 4xx; see sheets.is_permanent_error) is marked
+'failed' instead of being retried forever. Failed rows stay in the outbox
+and are queued again when the queue is next created, e.g. after the
+configuration is fixed and the app restarted. The last error is kept in
+`last_error` until a write succeeds, so the app can show it.
+
+A batch still 'sending' (the call failed, or the process stopped before
+the acknowledgement) may already be in the sheet. Exactly that batch is
+compared with the end of the sheet (sheets.rows_at_tail) and only sent
+again if it is not there, before any newer rows for the worksheet.
+
+The header row of each worksheet is read once per process and cached.
+Outgoing rows are placed by header name, not by their order, so appends
+cost a single call. The cache is dropped when a write fails or when a row
+carries a field the cached layout does not have.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from sheets import is_permanent_error, rows_at_tail
+
+PENDING = "pending"
+SENDING = "sending"
+ACKNOWLEDGED = "acknowledged"
+FAILED = "failed"
+
+
+def align_row(row, row_headers, sheet_headers):
+    """Reorders `row` (ordered like `row_headers`) into the sheet's column order by name."""
+    values = dict(zip(row_headers, row))
+    return [values.get(name, "") for name in sheet_headers]
+
+
+class SheetsWriteQueue:
+    """
+    - backend: object with `worksheet(name)` (see sheets.py)
+    - path: SQLite outbox file
+    - flush_interval: seconds between background flushes
+    - max_batch: most rows sent to one worksheet in a single append_rows
+    """
+
+    def __init__(self, backend, path="sheets_outbox.db", flush_interval=2.0, max_batch=500):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.last_error = None
+        self._sheet_headers = {}  # worksheet name -> verified header row
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " submission_id TEXT NOT NULL,"
+            " worksheet TEXT NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " row TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " created_at REAL NOT NULL,"
+            " acked_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, worksheet, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_submission ON outbox (submission_id)")
+        self._db.execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDING, FAILED))
+        self._db.commit()
+        self._thread = threading.Thread(target=self._run, name="sheets-write-queue", daemon=True)
+        self._thread.start()
+
+    # --- Producer side (Streamlit script thread) ---
+    def enqueue(self, worksheet, headers, rows, submission_id=None):
+        """
+        Durably queues `rows` (lists ordered like `headers`) and returns a
+        submission id. A caller-supplied `submission_id` that is already in
+        the outbox is not queued again, so retried submissions are safe.
+        """
+        submission_id = submission_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM outbox WHERE submission_id = ? LIMIT 1", (submission_id,)).fetchone():
+                return submission_id
+            self._db.executemany(
+                "INSERT INTO outbox (submission_id, worksheet, headers, row, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(submission_id, worksheet, json.dumps(headers), json.dumps(row, default=str), now) for row in rows],
+            )
+            self._db.commit()
+        return submission_id
+
+    def status(self, submission_id):
+        """{'pending': n, 'acknowledged': m, 'failed': k} for one submission ('sending' counts as pending)."""
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM outbox WHERE submission_id = ? GROUP BY status",
+                (submission_id,),
+            ).fetchall())
+        counts[PENDING] = counts.get(PENDING, 0) + counts.pop(SENDING, 0)
+        return {status: counts.get(status, 0) for status in (PENDING, ACKNOWLEDGED, FAILED)}
+
+    def pending_rows(self, worksheet):
+        """(headers, row) of every row still waiting to be written to `worksheet`."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT headers, row FROM outbox WHERE status IN (?, ?) AND worksheet = ? ORDER BY id",
+                (SENDING, PENDING, worksheet),
+            ).fetchall()
+        return [(json.loads(headers), json.loads(row)) for headers, row in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (SENDING, PENDING)
+            ).fetchone()[0]
+
+    def flush_now(self):
+        """Asks the background thread to flush without waiting for the next tick."""
+        self._wake.set()
+
+    # --- Consumer side (background thread) ---
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                if self.flush():
+                    self.last_error = None
+            except Exception as e:
+                # Rows stay pending (or were marked failed) and the error is kept for the app to show
+                self.last_error = e
+
+    def flush(self):
+        """Writes every pending row, one append_rows per worksheet per batch. Returns the rows written."""
+        with self._lock:
+            worksheets = [w for (w,) in self._db.execute(
+                "SELECT DISTINCT worksheet FROM outbox WHERE status IN (?, ?)", (SENDING, PENDING)
+            )]
+        written = 0
+        for worksheet in worksheets:
+            while True:
+                n_rows = self._flush_batch(worksheet)
+                if not n_rows:
+                    break
+                written += n_rows
+        return written
+
+    def _flush_batch(self, worksheet_name):
+        """Sends the batch still in flight for `worksheet_name`, else the next pending one. Returns its size."""
+        with self._lock:
+            batch = self._db.execute(
+                "SELECT id, headers, row FROM outbox WHERE status = ? AND worksheet = ? ORDER BY id",
+                (SENDING, worksheet_name),
+            ).fetchall()
+            in_flight = bool(batch)
+            if not in_flight:
+                batch = self._db.execute(
+                    "SELECT id, headers, row FROM outbox WHERE status = ? AND worksheet = ? ORDER BY id LIMIT ?",
+                    (PENDING, worksheet_name, self.max_batch),
+                ).fetchall()
+        if not batch:
+            return 0
+
+        try:
+            worksheet = self.backend.worksheet(worksheet_name)
+            rows = []
+            layouts = {}  # each distinct header list is verified at most once per batch
+            for _, headers_json, row in batch:
+                headers = json.loads(headers_json)
+                if headers_json not in layouts:
+                    layouts[headers_json] = self._verified_headers(worksheet, headers)
+                sheet_headers = layouts[headers_json]
+                if set(headers) <= set(sheet_headers):
+                    rows.append(align_row(json.loads(row), headers, sheet_headers))
+                else:
+                    # Sheet lacks some of these fields: keep the submitted order as before
+                    rows.append(json.loads(row))
+
+            if in_flight:
+                landed = rows_at_tail(worksheet, rows)
+            else:
+                # Recorded before the call, so a crash during it leaves exactly these rows to verify
+                self._set_status(batch, SENDING)
+                landed = False
+            if not landed:
+                worksheet.append_rows(rows)
+        except Exception as e:
+            # The layout may have changed under us; verify it again next time
+            self._sheet_headers.pop(worksheet_name, None)
+            if is_permanent_error(e):
+                self._set_status(batch, FAILED)
+            raise
+
+        self._set_status(batch, ACKNOWLEDGED)
+        return len(batch)
+
+    def _set_status(self, batch, status):
+        acked_at = time.time() if status == ACKNOWLEDGED else None
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET status = ?, acked_at = ? WHERE id = ?",
+                [(status, acked_at, row_id) for row_id, _, _ in batch],
+            )
+            self._db.commit()
+
+    def _verified_headers(self, worksheet, headers):
+        """
+        The worksheet's header row, from the process cache when it covers
+        `headers`; otherwise re-read from the sheet (writing `headers` first
+        if the sheet is empty).
+        """
+        cached = self._sheet_headers.get(worksheet.title)
+        if cached is not None and set(headers) <= set(cached):
+            return cached
+
+        sheet_headers = worksheet.row_values(1)
+        if not sheet_headers:
+            worksheet.append_row(headers)
+            sheet_headers = list(headers)
+        self._sheet_headers[worksheet.title] = sheet_headers
+        return sheet_headers